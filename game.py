@@ -3,15 +3,41 @@ import sys
 import os
 import math
 import random
+import heapq
+import time
+import hashlib
+import json
+import mmap
+import struct
+from array import array
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 pygame.init()
 
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
 TILE_SIZE = 32
+CHUNK_SIZE = 512
 PLAYER_SPEED = 5
 JUMP_FORCE = -13
 GRAVITY = 0.5
 FPS = 60
+SIM_RATE = 60  # Fixed simulation steps per second, independent of FPS
+SIM_STEP = 1000 / SIM_RATE  # ms
+MAX_FRAME_TIME = 250  # ms of real time simulated per rendered frame at most
+PROJECTILE_CAPACITY = 2048
+ACTIVITY_MARGIN = (256, 192)  # px beyond the viewport where enemies stay awake
+ACTIVITY_CELL_WIDTH = 256  # px per column when bucketing sleeping enemies
+AI_PATROL_INTERVAL = 4  # steps between think() calls for idle enemies near the player
+AI_FAR_INTERVAL = 16  # steps between think() calls for idle enemies far from the player
+AI_FAR_DISTANCE = 480  # px
+BODY_PLAYER = 0
+BODY_ATTACK = 1
+BODY_ENEMY = 2
+BODY_PROJECTILE = 3
+PROJECTILE_LIFETIME = 3000  # ms
 KNOCKBACK_FORCE = 10  # Force of knockback
 KNOCKBACK_DURATION = 300  # ms
 STUN_DURATION = 1000  # ms
@@ -29,15 +55,514 @@ MAGENTA = (255, 0, 255)
 ORANGE = (255, 165, 0)
 WHITE = (255, 255, 255)
 
+TILE_EMPTY = 0
+TILE_GROUND = 1
+TILE_WALL = 2
+TILE_PLATFORM = 3
+TILE_COLORS = {
+    TILE_GROUND: BROWN,
+    TILE_WALL: RED,
+    TILE_PLATFORM: GREEN
+}
+TILE_NAMES = {
+    TILE_GROUND: "ground",
+    TILE_WALL: "wall",
+    TILE_PLATFORM: "platform"
+}
+
+LAYER_TILES = 0
+LAYER_GOAL = 1
+LAYER_PROJECTILES = 2
+LAYER_ENEMIES = 3
+LAYER_PLAYER = 4
+LAYER_HEALTH_BARS = 5
+LAYER_EFFECTS = 6
+LAYER_COUNT = 7
+
+PRELOAD_IMAGES = [
+    "img/idle_anim.png", "img/jump_anim.png", "img/hit_anim.png", "img/attack_anim.png", "img/run_anim.png",
+    "img/attack_frame2.png", "img/attack_frame3.png",
+    "img/goon_idle.png", "img/goon_walk.png", "img/goon_atack.png", "img/goon_hit.png",
+    "img/shooter_idle.png", "img/shooter_shot.png", "img/shooter_hit.png",
+    "img/tile.jpg", "img/background_level1.png",
+]
+PRELOAD_SOUNDS = ["music/videoplayback.mp3"]
+ASSET_LOADED = pygame.event.custom_type()
+BUNDLE_PATH = "img/assets.bundle"
+BUNDLE_MAGIC = b"NECOBAKE"
+BUNDLE_VERSION = 2  # Bump when slicing, cropping or scaling changes what gets baked
+BUNDLE_HEADER = "<8sII"  # magic, version, index size
+ATLAS_PAGE_SIZE = 1024
+TEXT_CACHE_SIZE = 256  # rendered strings kept before the least recently used go
+GLYPHS = "0123456789/.:-+% "  # characters drawn from the glyph strip instead of rendered
+
+PHASE_EVENTS = 0
+PHASE_ACTIVITY = 1
+PHASE_ENEMIES = 2
+PHASE_PROJECTILES = 3
+PHASE_CONTACTS = 4
+PHASE_PLAYER = 5
+PHASE_CAMERA = 6
+PHASE_BACKGROUND = 7
+PHASE_TILES = 8
+PHASE_ENTITIES = 9
+PHASE_BLITS = 10
+PHASE_OVERLAYS = 11
+PHASE_FLIP = 12
+PHASE_NAMES = ["events", "activity", "enemies", "projectiles", "contacts", "player", "camera", "background",
+               "tiles", "entities", "blits", "overlays", "flip"]
+PROFILE_FRAMES = 600  # frames kept in the profiler's ring buffer
+PROFILE_REFRESH = 15  # frames between percentile updates on the overlay
+PROFILE_CSV = "profile.csv"
+
 BACKGROUND_SCROLL_SPEED = 0.5
 MIDGROUND_SCROLL_SPEED = 1.0
 FOREGROUND_SCROLL_SPEED = 1.5
 
 
+class Frame(pygame.Surface):
+    """Animation frame cropped to its visible pixels
+
+    offset is where the crop sat inside the original frame and full_size is
+    the original frame size, so entities keep positioning, hitboxes and
+    overlays by the uncropped frame while only the visible pixels are blitted.
+    """
+
+    def __init__(self, size, offset=(0, 0), full_size=None):
+        super().__init__(size, pygame.SRCALPHA)
+        self.offset = offset
+        self.full_size = full_size or size
+
+    @classmethod
+    def crop(cls, surface):
+        bounds = surface.get_bounding_rect()
+        frame = cls(bounds.size, bounds.topleft, surface.get_size())
+        frame.blit(surface, (0, 0), bounds)
+        return frame
+
+    def flipped(self):
+        frame = Frame(self.get_size(),
+                      (self.full_size[0] - self.offset[0] - self.get_width(), self.offset[1]),
+                      self.full_size)
+        frame.blit(pygame.transform.flip(self, True, False), (0, 0))
+        return frame
+
+
+class Atlas:
+    """Shelf-packs animation frames into a few large pages
+
+    pack() copies each frame into the next free spot of the current page and
+    hands back a subsurface of the page in its place, carrying the same offset
+    and full_size, so animations blit straight from the shared pages. Pixels
+    are copied, not blended, so they come out unchanged. Pages are never
+    repacked; frames the cache evicts just leave their space unused.
+    """
+
+    def __init__(self, page_size=ATLAS_PAGE_SIZE):
+        self.page_size = page_size
+        self.pages = []
+        self.page = None
+        self.x = self.y = self.shelf_height = 0
+
+    def place(self, width, height):
+        if width > self.page_size or height > self.page_size:
+            # Too big to share a page, so it gets one of its own
+            self.pages.append(Frame((width, height)))
+            return self.pages[-1], 0, 0
+        if self.page is not None and self.x + width > self.page_size:
+            self.x = 0
+            self.y += self.shelf_height
+            self.shelf_height = 0
+        if self.page is None or self.y + height > self.page_size:
+            self.page = Frame((self.page_size, self.page_size))
+            self.pages.append(self.page)
+            self.x = self.y = self.shelf_height = 0
+        x = self.x
+        self.x += width
+        self.shelf_height = max(self.shelf_height, height)
+        return self.page, x, self.y
+
+    def pack(self, frames):
+        packed = list(frames)
+        # Tallest first keeps the shelves tight
+        for i in sorted(range(len(frames)), key=lambda i: -frames[i].get_height()):
+            frame = frames[i]
+            width, height = frame.get_size()
+            if not width or not height:
+                continue
+            page, x, y = self.place(width, height)
+            pixels = pygame.surfarray.pixels2d(page)
+            pixels[x:x + width, y:y + height] = pygame.surfarray.pixels2d(frame)
+            del pixels
+            region = page.subsurface((x, y, width, height))
+            region.offset = frame.offset
+            region.full_size = frame.full_size
+            packed[i] = region
+        return packed
+
+
+def file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class AssetBundle:
+    """Images and animation frames baked into one file of raw pixels
+
+    The file is a header, a JSON index and the pixel rows of every surface the
+    cache built while baking, under the same keys as the cache, so a hit skips
+    decoding, slicing, scaling, cropping and flipping. Entries are only used
+    while the sha1 of their source file matches the one recorded at bake time;
+    anything else is a miss and the cache loads the file as before. The file
+    is memory-mapped, so opening it costs the index and the source hashes.
+    Baked frames are packed into atlas as they are loaded.
+    """
+
+    def __init__(self, atlas):
+        self.atlas = atlas
+        self.data = None
+        self.base = 0
+        self.entries = {}
+        self.sources = set()
+        self.baking = None
+
+    def open(self, path=BUNDLE_PATH):
+        """Map a baked file; anything unreadable, stale or damaged is ignored
+        and the cache falls back to decoding the source files"""
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        try:
+            magic, version, index_size = struct.unpack_from(BUNDLE_HEADER, data)
+            if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+                print(f"Ignoring {path}: baked by another version, run with --bake to rebuild it")
+                data.close()
+                return False
+            start = struct.calcsize(BUNDLE_HEADER)
+            base = start + index_size
+            index = json.loads(data[start:base])
+            entries = index["entries"]
+            # An interrupted bake leaves the index pointing past the end
+            end = max((item["data"] + item["pitch"] * item["size"][1]
+                       for entry in entries.values() for item in entry["surfaces"]), default=0)
+            if base + end > len(data):
+                raise ValueError("pixel data is truncated")
+            sources = {path for path, digest in index["sources"].items() if file_digest(path) == digest}
+            entries = {key: entry for key, entry in entries.items() if entry["source"] in sources}
+        except (ValueError, KeyError, TypeError, AttributeError, IndexError, struct.error):
+            print(f"Ignoring {path}: damaged, run with --bake to rebuild it")
+            data.close()
+            return False
+        self.data = data
+        self.base = base
+        self.sources = sources
+        self.entries = entries
+        return True
+
+    def load(self, key):
+        entry = self.entries.get(repr(key))
+        if entry is None:
+            return None
+        surfaces = [self.surface(item) for item in entry["surfaces"]]
+        if None in surfaces:
+            return None
+        return self.atlas.pack(surfaces) if entry["frames"] else surfaces[0]
+
+    def surface(self, item):
+        if "full_size" in item:
+            surface = Frame(tuple(item["size"]), tuple(item["offset"]), tuple(item["full_size"]))
+        else:
+            surface = pygame.Surface(item["size"], pygame.SRCALPHA if item["alpha"] else 0, item["bitsize"],
+                                     item["masks"])
+        # Only copy rows that land in the same layout they were baked from
+        if list(surface.get_masks()) != item["masks"] or surface.get_pitch() != item["pitch"]:
+            return None
+        start = self.base + item["data"]
+        surface.get_buffer().write(self.data[start:start + item["pitch"] * surface.get_height()])
+        return surface
+
+    def record(self, key, value):
+        if self.baking is None or not isinstance(key, tuple) or not isinstance(key[0], str):
+            return
+        surfaces = value if isinstance(value, list) else [value]
+        if surfaces and all(isinstance(s, pygame.Surface) for s in surfaces) and os.path.isfile(key[0]):
+            self.baking[repr(key)] = (key[0], value)
+
+    def bake(self, path=BUNDLE_PATH):
+        """Write everything recorded since baking was set to a dict"""
+        index = {"sources": {}, "entries": {}}
+        chunks = []
+        size = 0
+        for key, (source, value) in self.baking.items():
+            index["sources"][source] = file_digest(source)
+            items = []
+            for surface in value if isinstance(value, list) else [value]:
+                item = {"size": surface.get_size(), "alpha": bool(surface.get_flags() & pygame.SRCALPHA),
+                        "bitsize": surface.get_bitsize(), "masks": surface.get_masks(),
+                        "pitch": surface.get_pitch(), "data": size}
+                if isinstance(surface, Frame):
+                    item["offset"] = surface.offset
+                    item["full_size"] = surface.full_size
+                if surface.get_parent():
+                    # Atlas regions share their page's rows, so store a standalone copy
+                    surface = surface.copy()
+                    item["pitch"] = surface.get_pitch()
+                pixels = surface.get_buffer().raw
+                chunks.append(pixels)
+                size += len(pixels)
+                items.append(item)
+            index["entries"][key] = {"source": source, "frames": isinstance(value, list), "surfaces": items}
+        encoded = json.dumps(index).encode()
+        with open(path, "wb") as f:
+            f.write(struct.pack(BUNDLE_HEADER, BUNDLE_MAGIC, BUNDLE_VERSION, len(encoded)))
+            f.write(encoded)
+            f.writelines(chunks)
+        return len(index["entries"]), size
+
+
+class AssetCache:
+    """Process-wide store of decoded images and sliced animation frames
+
+    Entries are keyed by (path, frame size, scale, flipped), images also by
+    their alpha mode, and reference counted. Flipped entries are mirrored
+    once from the unflipped ones, and sliced frames, flipped or not, live in
+    regions of the shared atlas.
+    Callers pass a keys list that collects what they acquired so it can be
+    handed back to release(); evict() drops entries nobody holds. Files an
+    AssetLoader already decoded wait in preloaded until first use, and
+    entries the bundle has baked are built from it without touching the file.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.refs = {}
+        self.preloaded = {}
+        self.atlas = Atlas()
+        self.bundle = AssetBundle(self.atlas)
+
+    def take(self, path, decode):
+        if path in self.preloaded:
+            return self.preloaded.pop(path)
+        return decode(path)
+
+    def acquire(self, key, loader, keys=None):
+        if key not in self.entries:
+            baked = self.bundle.load(key)
+            self.entries[key] = loader() if baked is None else baked
+            self.bundle.record(key, self.entries[key])
+            self.refs[key] = 0
+        self.refs[key] += 1
+        if keys is not None:
+            keys.append(key)
+        return self.entries[key]
+
+    def retain(self, keys):
+        for key in keys:
+            if key in self.entries:
+                self.refs[key] += 1
+
+    def release(self, keys):
+        for key in keys:
+            if self.refs.get(key, 0) > 0:
+                self.refs[key] -= 1
+
+    def evict(self, keys=None):
+        for key in list(self.entries if keys is None else keys):
+            if self.refs.get(key, 0) <= 0:
+                self.entries.pop(key, None)
+                self.refs.pop(key, None)
+
+    def image(self, path, size=None, flip=False, alpha=True, keys=None):
+        def load():
+            if flip:
+                return pygame.transform.flip(self.image(path, size, alpha=alpha, keys=keys), True, False)
+            if size is not None:
+                return pygame.transform.scale(self.image(path, alpha=alpha, keys=keys), size)
+            image = self.take(path, pygame.image.load)
+            if alpha is None:
+                # Keep per-pixel alpha only if the file has it
+                return image.convert_alpha() if image.get_flags() & pygame.SRCALPHA else image.convert()
+            return image.convert_alpha() if alpha else image.convert()
+
+        return self.acquire((path, None, size, flip, alpha), load, keys)
+
+    def frames(self, path, frame_width, frame_height, scale=1.0, flip=False, keys=None):
+        def load():
+            if flip:
+                frames = self.frames(path, frame_width, frame_height, scale, keys=keys)
+                return self.atlas.pack([frame.flipped() for frame in frames])
+            sheet = self.take(path, pygame.image.load).convert_alpha()
+            frame_count = sheet.get_height() // frame_height
+            scaled_size = (int(frame_width * scale), int(frame_height * scale))
+            frames = []
+            for i in range(frame_count):
+                frame = pygame.Surface((frame_width, frame_height), pygame.SRCALPHA)
+                frame.blit(sheet, (0, 0), (0, i * frame_height, frame_width, frame_height))
+                if scale != 1.0:
+                    frame = pygame.transform.scale(frame, scaled_size)
+                frames.append(Frame.crop(frame))
+            return self.atlas.pack(frames)
+
+        return self.acquire((path, (frame_width, frame_height), scale, flip), load, keys)
+
+
+assets = AssetCache()
+
+
+class AssetLoader:
+    """Decodes image and sound files on worker threads
+
+    Only decoding leaves the main thread. Each finished file posts an
+    ASSET_LOADED event, and poll(), called from the main thread, moves the
+    results into assets.preloaded. Display conversion happens there too, the
+    first time something asks the cache for the file.
+    """
+
+    def __init__(self, images=PRELOAD_IMAGES, sounds=PRELOAD_SOUNDS, workers=2):
+        self.executor = ThreadPoolExecutor(workers)
+        self.pending = {}
+        for path in images:
+            if path in assets.bundle.sources:
+                continue
+            self.submit(path, pygame.image.load)
+        if pygame.mixer.get_init():
+            for path in sounds:
+                self.submit(path, pygame.mixer.Sound)
+        self.total = len(self.pending)
+        self.loaded = 0
+
+    def submit(self, path, decode):
+        future = self.executor.submit(decode, path)
+        future.add_done_callback(lambda _: pygame.event.post(pygame.event.Event(ASSET_LOADED, path=path)))
+        self.pending[future] = path
+
+    def poll(self):
+        for future in [future for future in self.pending if future.done()]:
+            path = self.pending.pop(future)
+            try:
+                assets.preloaded[path] = future.result()
+            except Exception as e:
+                print(f"Could not preload {path}: {e}")
+            self.loaded += 1
+        if not self.pending:
+            self.executor.shutdown(wait=False)
+        return self.progress()
+
+    def progress(self):
+        return self.loaded / self.total if self.total else 1.0
+
+    def finished(self):
+        return not self.pending
+
+
+class Timer:
+    """Handle for one scheduled expiry; truthy until it fires or is cancelled"""
+
+    __slots__ = ("deadline", "callback", "pending")
+
+    def __init__(self, deadline, callback=None):
+        self.deadline = deadline
+        self.callback = callback
+        self.pending = True
+
+    def __bool__(self):
+        return self.pending
+
+    def cancel(self):
+        self.pending = False
+
+
+class TimerQueue:
+    """One-shot timers keyed on simulation time
+
+    Entities keep the returned Timer as a flag (hit, invincible, stunned...)
+    and optionally pass a callback to run on expiry. advance() pops only the
+    timers that are due, so nothing is decremented per entity per step.
+    Cancelled timers stay in the heap until their deadline and are skipped.
+    """
+
+    def __init__(self):
+        self.now = 0
+        self.heap = []
+        self.sequence = 0
+
+    def clear(self):
+        self.now = 0
+        self.heap = []
+
+    def schedule(self, delay, callback=None):
+        timer = Timer(self.now + delay, callback)
+        heapq.heappush(self.heap, (timer.deadline, self.sequence, timer))
+        self.sequence += 1
+        return timer
+
+    def restart(self, timer, delay, callback=None):
+        if timer:
+            timer.cancel()
+        return self.schedule(delay, callback)
+
+    def remaining(self, timer):
+        return max(0, timer.deadline - self.now) if timer else 0
+
+    def advance(self, dt):
+        self.now += dt
+        heap = self.heap
+        while heap and heap[0][0] <= self.now:
+            timer = heapq.heappop(heap)[2]
+            if timer.pending:
+                timer.pending = False
+                if timer.callback is not None:
+                    timer.callback()
+
+
+timers = TimerQueue()
+
+
+class Snapshot:
+    """Attribute state of some objects, restorable onto the same objects
+
+    Rects, vectors, lists and dicts are copied on capture and on restore so
+    play never writes into the snapshot; surfaces, animation tables and other
+    shared references are kept as they are. Private attributes, such as a
+    sprite's group bookkeeping, are left alone, and public attributes added
+    after the capture are removed on restore.
+    """
+
+    def __init__(self, objects):
+        self.states = [(obj, {name: self.copy(value) for name, value in vars(obj).items()
+                              if not name.startswith("_")})
+                       for obj in objects]
+
+    @staticmethod
+    def copy(value):
+        if isinstance(value, pygame.Rect):
+            return value.copy()
+        if isinstance(value, pygame.math.Vector2):
+            return pygame.math.Vector2(value)
+        if isinstance(value, (list, dict)):
+            return value.copy()
+        return value
+
+    def restore(self):
+        for obj, state in self.states:
+            attributes = vars(obj)
+            for name in [name for name in attributes if not name.startswith("_") and name not in state]:
+                del attributes[name]
+            for name, value in state.items():
+                attributes[name] = self.copy(value)
+
+
 class Player(pygame.sprite.Sprite):
     def __init__(self, x, y):
         super().__init__()
+        self.asset_keys = []
         self.animations = self.load_animations()
+        self.animations_left = self.load_animations(flip=True)
         self.current_state = "idle"
         self.current_frame = 0
         self.animation_speed = 100
@@ -45,7 +570,7 @@ class Player(pygame.sprite.Sprite):
         self.image = self.animations[self.current_state][self.current_frame]
         self.prev_state = "idle"
 
-        self.rect = self.image.get_rect(topleft=(x, y))
+        self.rect = pygame.Rect((x, y), self.image.full_size)
 
         self.hitbox = pygame.Rect(0, 0, 20, 40)
         self.hitbox.midbottom = self.rect.midbottom
@@ -55,7 +580,7 @@ class Player(pygame.sprite.Sprite):
         self.direction = pygame.math.Vector2(0, 0)
         self.on_ground = False
         self.facing_right = True
-        self.hit_timer = 0
+        self.hit_timer = None
         self.hit_cooldown = 1000
         self.show_hitbox = False
         self.was_running = False
@@ -63,13 +588,14 @@ class Player(pygame.sprite.Sprite):
 
         # Attack system variables
         self.is_attacking = False
-        self.attack_timer = 0
+        self.attack_timer = None
         self.attack_cooldown = 500
         self.attack_frame = 0
         self.attack_hitbox = None
         self.attack_direction = 1
 
         self.attack_overlays = {}
+        self.attack_overlays_left = {}
         self.load_attack_overlays()
         self.current_overlay = None
         self.overlay_positions = {
@@ -79,32 +605,30 @@ class Player(pygame.sprite.Sprite):
 
         self.health = 100
         self.max_health = 100
-        self.invincible = False
-        self.invincibility_timer = 0
+        self.invincible = None
         self.invincibility_duration = 500  # ms
 
         self.knockback_velocity = pygame.math.Vector2(0, 0)
-        self.knockback_timer = 0
-        self.stunned = False
-        self.stun_timer = 0
+        self.knockback_timer = None
+        self.stunned = None
 
         self.is_alive = True
-        self.death_time = 0
         self.respawn_time = 3000
+        self.respawn_timer = None
 
         self.total_enemies_killed = 0
         self.initial_health = self.health
         self.level_complete = False
 
-    def load_animations(self):
+    def load_animations(self, flip=False):
         animations = {
-            "idle": self.load_spritesheet("img/idle_anim.png", 30, 256),
-            "jump": self.load_spritesheet("img/jump_anim.png", 36, 257),
-            "hit": self.load_spritesheet("img/hit_anim.png", 28, 256),
-            "attack": self.load_spritesheet("img/attack_anim.png", 50, 256)
+            "idle": self.load_spritesheet("img/idle_anim.png", 30, 256, flip),
+            "jump": self.load_spritesheet("img/jump_anim.png", 36, 257, flip),
+            "hit": self.load_spritesheet("img/hit_anim.png", 28, 256, flip),
+            "attack": self.load_spritesheet("img/attack_anim.png", 50, 256, flip)
         }
 
-        run_frames = self.load_spritesheet("img/run_anim.png", 35, 257)
+        run_frames = self.load_spritesheet("img/run_anim.png", 35, 257, flip)
 
         animations["start_run"] = run_frames[0:2]
         animations["run"] = run_frames[2:-2]
@@ -112,54 +636,23 @@ class Player(pygame.sprite.Sprite):
 
         return animations
 
-    def load_spritesheet(self, filename, frame_width, frame_height):
-        sheet = pygame.image.load(filename).convert_alpha()
-
-        frame_count = sheet.get_height() // frame_height
-        frames = []
-        for i in range(frame_count):
-            frame = pygame.Surface((frame_width, frame_height), pygame.SRCALPHA)
-            frame.blit(sheet, (0, 0), (0, i * frame_height, frame_width, frame_height))
-            frames.append(frame)
-
-        return frames
+    def load_spritesheet(self, filename, frame_width, frame_height, flip=False):
+        return assets.frames(filename, frame_width, frame_height, flip=flip, keys=self.asset_keys)
 
     def load_attack_overlays(self):
-        overlay1 = pygame.image.load("img/attack_frame2.png").convert_alpha()
-        overlay1 = pygame.transform.scale(overlay1, (98, 60))
-        self.attack_overlays[2] = overlay1
-        print("Loaded attack_frame2.png")
+        self.attack_overlays[2] = assets.image("img/attack_frame2.png", (98, 60), keys=self.asset_keys)
+        self.attack_overlays_left[2] = assets.image("img/attack_frame2.png", (98, 60), True, keys=self.asset_keys)
 
-        overlay2 = pygame.image.load("img/attack_frame3.png").convert_alpha()
-        overlay2 = pygame.transform.scale(overlay2, (100, 40))
-        self.attack_overlays[3] = overlay2
-        print("Loaded attack_frame3.png")
+        self.attack_overlays[3] = assets.image("img/attack_frame3.png", (100, 40), keys=self.asset_keys)
+        self.attack_overlays_left[3] = assets.image("img/attack_frame3.png", (100, 40), True, keys=self.asset_keys)
 
     def update(self, tiles, dt):
         if not self.is_alive:
-            current_time = pygame.time.get_ticks()
-            if current_time - self.death_time > self.respawn_time:
-                self.respawn(100, 300)
             return
         self.actually_moved_x = False
 
         self.update_knockback_stun(dt)
 
-        if self.is_attacking:
-            self.attack_timer -= dt
-            if self.attack_timer <= 0:
-                self.is_attacking = False
-                self.attack_hitbox = None
-                self.current_overlay = None
-
-        if self.hit_timer > 0:
-            self.hit_timer -= dt
-
-        if self.invincible:
-            self.invincibility_timer -= dt
-            if self.invincibility_timer <= 0:
-                self.invincible = False
-
         prev_x = self.rect.x
         self.rect.x += self.direction.x * PLAYER_SPEED
         self.hitbox.centerx = self.rect.centerx
@@ -181,7 +674,6 @@ class Player(pygame.sprite.Sprite):
             if self.is_attacking:
                 self.attack_frame += 1
                 frames = self.animations["attack"]
-                self.attack_timer -= dt
                 self.update_attack_hitbox()
                 if self.attack_frame >= len(frames):
                     self.is_attacking = False
@@ -200,15 +692,14 @@ class Player(pygame.sprite.Sprite):
                 self.current_frame = (self.current_frame + 1) % len(frames)
                 self.current_overlay = None
 
+        animations = self.animations if self.facing_right else self.animations_left
         try:
             if self.is_attacking:
-                self.image = self.animations["attack"][self.attack_frame]
+                self.image = animations["attack"][self.attack_frame]
             else:
-                self.image = self.animations[self.current_state][self.current_frame]
+                self.image = animations[self.current_state][self.current_frame]
         except IndexError:
             pass
-        if not self.facing_right:
-            self.image = pygame.transform.flip(self.image, True, False)
 
         if self.stunned:
             self.apply_gravity(tiles)
@@ -232,24 +723,13 @@ class Player(pygame.sprite.Sprite):
         self.collide_vertical(tiles)
 
     def update_knockback_stun(self, dt):
-        if self.knockback_timer > 0:
+        if self.knockback_timer:
             self.rect.x += self.knockback_velocity.x
             self.rect.y += self.knockback_velocity.y
             self.hitbox.centerx = self.rect.centerx
             self.hitbox.bottom = self.rect.bottom - 4
 
             self.knockback_velocity *= 0.9
-            self.knockback_timer -= dt
-
-            if self.knockback_timer <= 0:
-                self.stunned = True
-                self.stun_timer = STUN_DURATION
-                self.knockback_velocity = pygame.math.Vector2(0, 0)
-
-        if self.stunned:
-            self.stun_timer -= dt
-            if self.stun_timer <= 0:
-                self.stunned = False
 
         if self.stunned:
             self.current_state = "hit"
@@ -264,17 +744,21 @@ class Player(pygame.sprite.Sprite):
             direction = pygame.math.Vector2(-1 if self.facing_right else 1, -0.3)
 
         self.knockback_velocity = direction * force
-        self.knockback_timer = KNOCKBACK_DURATION
+        self.knockback_timer = timers.restart(self.knockback_timer, KNOCKBACK_DURATION, self.end_knockback)
         self.velocity_y = 0
 
         self.take_hit()
 
+    def end_knockback(self):
+        self.stunned = timers.restart(self.stunned, STUN_DURATION)
+        self.knockback_velocity = pygame.math.Vector2(0, 0)
+
     def update_animation_state(self):
         if self.is_attacking:
             self.current_state = "attack"
             return
 
-        if self.hit_timer > 0:
+        if self.hit_timer:
             self.current_state = "hit"
             return
 
@@ -314,37 +798,42 @@ class Player(pygame.sprite.Sprite):
             self.current_state = "idle"
 
     def collide_horizontal(self, tiles):
-        for tile in tiles:
-            if self.hitbox.colliderect(tile.rect):
+        for tile_rect in tiles.query(self.hitbox):
+            if self.hitbox.colliderect(tile_rect):
                 if self.direction.x > 0:
-                    self.hitbox.right = tile.rect.left
+                    self.hitbox.right = tile_rect.left
                 elif self.direction.x < 0:
-                    self.hitbox.left = tile.rect.right
+                    self.hitbox.left = tile_rect.right
                 self.rect.centerx = self.hitbox.centerx
 
     def collide_vertical(self, tiles):
         self.on_ground = False
-        for tile in tiles:
-            if self.hitbox.colliderect(tile.rect):
+        for tile_rect in tiles.query(self.hitbox):
+            if self.hitbox.colliderect(tile_rect):
                 if self.velocity_y > 0:
-                    self.hitbox.bottom = tile.rect.top
+                    self.hitbox.bottom = tile_rect.top
                     self.rect.bottom = self.hitbox.bottom + 4
                     self.on_ground = True
                     self.velocity_y = 0
                 elif self.velocity_y < 0:
-                    self.hitbox.top = tile.rect.bottom + 3
+                    self.hitbox.top = tile_rect.bottom + 3
                     self.rect.top = self.hitbox.top - (self.rect.height - self.hitbox.height) + 3
                     self.velocity_y = 0
 
     def attack(self):
         if not self.is_attacking and not self.stunned:
             self.is_attacking = True
-            self.attack_timer = self.attack_cooldown
+            self.attack_timer = timers.restart(self.attack_timer, self.attack_cooldown, self.end_attack)
             self.attack_frame = 0
             self.current_overlay = None
 
             self.update_attack_hitbox()
 
+    def end_attack(self):
+        self.is_attacking = False
+        self.attack_hitbox = None
+        self.current_overlay = None
+
     def update_attack_hitbox(self):
         if not self.is_attacking:
             return
@@ -373,20 +862,19 @@ class Player(pygame.sprite.Sprite):
             self.velocity_y = JUMP_FORCE
 
     def take_hit(self):
-        if self.hit_timer <= 0:
-            self.hit_timer = self.hit_cooldown
+        if not self.hit_timer:
+            self.hit_timer = timers.schedule(self.hit_cooldown)
 
     def take_damage(self, amount, source_x, source_y):
         if not self.invincible and self.is_alive:
             self.health -= amount
-            self.invincible = True
-            self.invincibility_timer = self.invincibility_duration
+            self.invincible = timers.restart(self.invincible, self.invincibility_duration)
             self.take_hit()
             self.apply_knockback(source_x, source_y)
             if self.health <= 0:
                 self.health = 0
                 self.is_alive = False
-                self.death_time = pygame.time.get_ticks()
+                self.respawn_timer = timers.schedule(self.respawn_time, lambda: self.respawn(100, 300))
                 self.current_state = "hit"
                 self.current_frame = 0
 
@@ -398,12 +886,21 @@ class Player(pygame.sprite.Sprite):
         self.hitbox.bottom -= 4
         self.velocity_y = 0
         self.direction = pygame.math.Vector2(0, 0)
-        self.invincible = True
-        self.invincibility_timer = 2000
-        self.stunned = False
+        self.on_ground = False
+        self.invincible = timers.restart(self.invincible, 2000)
+        for timer in (self.stunned, self.knockback_timer, self.hit_timer, self.attack_timer):
+            if timer:
+                timer.cancel()
         self.knockback_velocity = pygame.math.Vector2(0, 0)
+        self.is_attacking = False
+        self.attack_frame = 0
+        self.attack_hitbox = None
+        self.current_overlay = None
         self.current_state = "idle"
+        self.prev_state = "idle"
+        self.was_running = False
         self.current_frame = 0
+        self.animation_timer = 0
 
     def get_overlay_position(self):
         if self.current_overlay is None:
@@ -417,49 +914,454 @@ class Player(pygame.sprite.Sprite):
         return (self.rect.centerx + offset_x, self.rect.centery + offset_y)
 
     def get_overlay_sprite(self, frame):
-        if frame not in self.attack_overlays:
-            return None
-
-        sprite = self.attack_overlays[frame]
-
-        if not self.facing_right:
-            sprite = pygame.transform.flip(sprite, True, False)
-
-        return sprite
+        overlays = self.attack_overlays if self.facing_right else self.attack_overlays_left
+        return overlays.get(frame)
 
 
 class Tile(pygame.sprite.Sprite):
     def __init__(self, x, y, color):
         super().__init__()
-        self.image = pygame.Surface((TILE_SIZE, TILE_SIZE))
-        self.image = pygame.image.load('img/tile.jpg').convert_alpha()
+        self.image = assets.image('img/tile.jpg', alpha=False)
         self.rect = self.image.get_rect(topleft=(x, y))
 
 
-class Projectile(pygame.sprite.Sprite):
-    def __init__(self, x, y, direction, speed, damage, color, size=(10, 10)):
-        super().__init__()
-        self.image = pygame.Surface(size)
-        self.image.fill(color)
-        self.rect = self.image.get_rect(center=(x, y))
-        self.direction = direction.normalize() if direction.length() > 0 else pygame.math.Vector2(1, 0)
-        self.speed = speed
-        self.damage = damage
-        self.lifetime = 3000  # milliseconds
-        self.spawn_time = pygame.time.get_ticks()
+class TileGrid:
+    """Uniform grid over solid tile rects for cheap collision lookups
+
+    Rects may span many cells. query() clips each one to the cells the
+    hitbox touches, so a merged span pushes an entity out the same way the
+    single tiles it replaced would. Rects that already fit inside those
+    cells are returned as they are, so callers must not modify them.
+    """
+
+    def __init__(self, cell_size=TILE_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def cell_bounds(self, rect):
+        left = rect.left // self.cell_size
+        right = (rect.right - 1) // self.cell_size
+        top = rect.top // self.cell_size
+        bottom = (rect.bottom - 1) // self.cell_size
+        return left, right, top, bottom
+
+    def cells_for(self, rect):
+        left, right, top, bottom = self.cell_bounds(rect)
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                yield cx, cy
+
+    def add(self, rect):
+        for cell in self.cells_for(rect):
+            self.cells.setdefault(cell, []).append(rect)
+
+    def query(self, rect):
+        left, right, top, bottom = self.cell_bounds(rect)
+        cells = self.cells
+        # Rects are unhashable, so dedupe by identity, keeping first-seen order
+        found = {}
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                for tile_rect in cells.get((cx, cy), ()):
+                    found[id(tile_rect)] = tile_rect
+        if not found:
+            return []
+
+        touched = pygame.Rect(left * self.cell_size, top * self.cell_size,
+                              (right - left + 1) * self.cell_size,
+                              (bottom - top + 1) * self.cell_size)
+        contains = touched.contains
+        return [tile_rect if contains(tile_rect) else tile_rect.clip(touched) for tile_rect in found.values()]
+
+
+class TileMap:
+    """One tile id per cell, stored row-major in a byte array"""
+
+    def __init__(self, cols, rows, origin_col=0, origin_row=0):
+        self.cols = cols
+        self.rows = rows
+        self.origin_col = origin_col
+        self.origin_row = origin_row
+        self.cells = array('B', bytes(cols * rows))
+        self.merged = 0
+        self.rejected = 0
+
+    def index(self, col, row):
+        c = col - self.origin_col
+        r = row - self.origin_row
+        if not (0 <= c < self.cols and 0 <= r < self.rows):
+            raise ValueError(f"Cell ({col}, {row}) is outside the tile map")
+        return r * self.cols + c
+
+    def place(self, col, row, tile_id):
+        idx = self.index(col, row)
+        current = self.cells[idx]
+        if current == tile_id:
+            self.merged += 1
+            return False
+        if current != TILE_EMPTY:
+            self.rejected += 1
+            return False
+        self.cells[idx] = tile_id
+        return True
+
+    def place_at(self, x, y, tile_id):
+        return self.place(int(x) // TILE_SIZE, int(y) // TILE_SIZE, tile_id)
+
+    def solid_cells(self):
+        for idx, tile_id in enumerate(self.cells):
+            if tile_id != TILE_EMPTY:
+                row, col = divmod(idx, self.cols)
+                yield col + self.origin_col, row + self.origin_row, tile_id
+
+    def count(self):
+        return len(self.cells) - self.cells.count(TILE_EMPTY)
+
+    def counts(self):
+        counts = {}
+        for _, _, tile_id in self.solid_cells():
+            counts[tile_id] = counts.get(tile_id, 0) + 1
+        return counts
+
+    def make_sprites(self):
+        tiles = pygame.sprite.Group()
+        for col, row, tile_id in self.solid_cells():
+            tiles.add(Tile(col * TILE_SIZE, row * TILE_SIZE, TILE_COLORS[tile_id]))
+        return tiles
+
+    def collision_rects(self):
+        # Greedy meshing: grow each unclaimed solid cell right, then down
+        cells = self.cells
+        cols = self.cols
+        claimed = bytearray(len(cells))
+        rects = []
+        for row in range(self.rows):
+            for col in range(cols):
+                idx = row * cols + col
+                if cells[idx] == TILE_EMPTY or claimed[idx]:
+                    continue
+
+                width = 1
+                while col + width < cols and cells[idx + width] != TILE_EMPTY and not claimed[idx + width]:
+                    width += 1
+
+                height = 1
+                while row + height < self.rows:
+                    start = idx + height * cols
+                    if not all(cells[i] != TILE_EMPTY and not claimed[i] for i in range(start, start + width)):
+                        break
+                    height += 1
+
+                for r in range(height):
+                    start = idx + r * cols
+                    claimed[start:start + width] = b'\x01' * width
+
+                rects.append(pygame.Rect((col + self.origin_col) * TILE_SIZE,
+                                         (row + self.origin_row) * TILE_SIZE,
+                                         width * TILE_SIZE,
+                                         height * TILE_SIZE))
+        return rects
+
+    def make_grid(self):
+        grid = TileGrid()
+        for rect in self.collision_rects():
+            grid.add(rect)
+        return grid
+
+
+class TileLayer:
+    """Static tiles baked into CHUNK_SIZE surfaces, drawn only when on screen"""
+
+    def __init__(self, tiles, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.chunks = {}
+
+        for tile in tiles:
+            left = tile.rect.left // chunk_size
+            right = (tile.rect.right - 1) // chunk_size
+            top = tile.rect.top // chunk_size
+            bottom = (tile.rect.bottom - 1) // chunk_size
+            for cx in range(left, right + 1):
+                for cy in range(top, bottom + 1):
+                    chunk = self.chunks.get((cx, cy))
+                    if chunk is None:
+                        chunk = pygame.Surface((chunk_size, chunk_size), pygame.SRCALPHA)
+                        self.chunks[(cx, cy)] = chunk
+                    chunk.blit(tile.image, (tile.rect.x - cx * chunk_size, tile.rect.y - cy * chunk_size))
+
+    def queue(self, draw_list, camera):
+        view = camera.viewport()
+        size = self.chunk_size
+        for cx in range(view.left // size, (view.right - 1) // size + 1):
+            for cy in range(view.top // size, (view.bottom - 1) // size + 1):
+                chunk = self.chunks.get((cx, cy))
+                if chunk is not None:
+                    draw_list.add(chunk, (cx * size, cy * size), LAYER_TILES)
+
+
+class ProjectilePool:
+    """Fixed-capacity store for every live projectile
+
+    Positions, velocities, damage and expiry sit in parallel NumPy arrays so
+    a whole volley is moved, expired and hit-tested in one vectorized pass.
+    Projectiles of the same color and size share one cached image.
+    """
+
+    def __init__(self, capacity=PROJECTILE_CAPACITY):
+        self.capacity = capacity
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.prev_x = np.zeros(capacity)
+        self.prev_y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.width = np.zeros(capacity)
+        self.height = np.zeros(capacity)
+        self.damage = np.zeros(capacity, dtype=np.int32)
+        self.expiry = np.zeros(capacity)
+        self.kind = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+        self.kinds = {}
+        self.images = []
+        self.bounds = None
+        self.time = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.capacity - len(self.free)
+
+    def clear(self):
+        self.alive[:] = False
+        self.free = list(range(self.capacity - 1, -1, -1))
+        self.time = 0
+
+    def image_kind(self, color, size):
+        key = (tuple(color), tuple(size))
+        if key not in self.kinds:
+            image = pygame.Surface(size)
+            image.fill(color)
+            self.kinds[key] = len(self.images)
+            self.images.append(image.convert())
+        return self.kinds[key]
+
+    def spawn(self, x, y, direction, speed, damage, color, size=(10, 10), lifetime=PROJECTILE_LIFETIME):
+        if not self.free:
+            self.dropped += 1
+            return None
+
+        direction = direction.normalize() if direction.length() > 0 else pygame.math.Vector2(1, 0)
+        i = self.free.pop()
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.vx[i] = direction.x * speed
+        self.vy[i] = direction.y * speed
+        self.width[i], self.height[i] = size
+        self.damage[i] = damage
+        self.expiry[i] = self.time + lifetime
+        self.kind[i] = self.image_kind(color, size)
+        self.alive[i] = True
+        return i
+
+    def kill(self, indices):
+        self.alive[indices] = False
+        self.free.extend(indices.tolist())
 
     def update(self, dt):
-        self.rect.x += self.direction.x * self.speed * dt / 16
-        self.rect.y += self.direction.y * self.speed * dt / 16
+        self.time += dt
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+        self.x += self.vx * (dt / 16)
+        self.y += self.vy * (dt / 16)
+
+        expired = self.expiry < self.time
+        if self.bounds is not None:
+            expired |= ((self.x < self.bounds.left) | (self.x > self.bounds.right) |
+                        (self.y < self.bounds.top) | (self.y > self.bounds.bottom))
+        self.kill(np.flatnonzero(self.alive & expired))
+
+    def hit(self, indices):
+        indices = np.asarray(indices, dtype=np.intp)
+        hits = [(int(self.damage[i]), float(self.x[i]), float(self.y[i])) for i in indices]
+        self.kill(indices)
+        return hits
+
+    def queue(self, draw_list, camera):
+        indices = np.flatnonzero(self.alive)
+        if not len(indices):
+            return
+
+        alpha = camera.alpha
+        prev_x = self.prev_x[indices]
+        prev_y = self.prev_y[indices]
+        xs = prev_x + (self.x[indices] - prev_x) * alpha - self.width[indices] / 2
+        ys = prev_y + (self.y[indices] - prev_y) * alpha - self.height[indices] / 2
+        images = self.images
+        draw_list.extend([(images[k], (x, y)) for k, x, y in
+                          zip(self.kind[indices].tolist(), xs.round().tolist(), ys.round().tolist())],
+                         LAYER_PROJECTILES)
+
+
+projectile_pool = ProjectilePool()
+
+
+class Broadphase:
+    """Sort-and-sweep on x over everything that can touch in a step
+
+    Entity boxes are added one by one with a BODY_* group and live
+    projectiles are appended straight from the pool's arrays. sweep() sorts
+    the boxes by left edge, takes each box's run of x-overlapping neighbours
+    with searchsorted and keeps the pairs that also overlap on y, so the cost
+    follows the number of boxes and touching pairs, not every box against
+    every other. pairs() then picks out one kind of contact.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.left = []
+        self.top = []
+        self.right = []
+        self.bottom = []
+        self.groups = []
+        self.owners = []
+        self.group = np.zeros(0, dtype=np.int32)
+        self.pair_a = self.pair_b = np.zeros(0, dtype=np.intp)
+
+    def add(self, rect, owner, group):
+        self.left.append(rect.left)
+        self.top.append(rect.top)
+        self.right.append(rect.right)
+        self.bottom.append(rect.bottom)
+        self.groups.append(group)
+        self.owners.append(owner)
+
+    def add_projectiles(self, pool):
+        indices = np.flatnonzero(pool.alive)
+        half_w = pool.width[indices] / 2
+        half_h = pool.height[indices] / 2
+        xs = pool.x[indices]
+        ys = pool.y[indices]
+        self.left.extend((xs - half_w).tolist())
+        self.top.extend((ys - half_h).tolist())
+        self.right.extend((xs + half_w).tolist())
+        self.bottom.extend((ys + half_h).tolist())
+        self.groups.extend([BODY_PROJECTILE] * len(indices))
+        self.owners.extend(indices.tolist())
+
+    def sweep(self):
+        left = np.array(self.left, dtype=float)
+        top = np.array(self.top, dtype=float)
+        right = np.array(self.right, dtype=float)
+        bottom = np.array(self.bottom, dtype=float)
+        self.group = np.array(self.groups, dtype=np.int32)
+
+        order = np.argsort(left, kind="stable")
+        count = len(order)
+        # Sorted boxes i+1 .. ends[i]-1 start before box i ends
+        ends = np.searchsorted(left[order], right[order], side="left")
+        first = np.arange(1, count + 1)
+        runs = np.maximum(ends - first, 0)
+        a = np.repeat(np.arange(count), runs)
+        b = np.arange(runs.sum()) - np.repeat(np.cumsum(runs) - runs, runs) + np.repeat(first, runs)
+        a, b = order[a], order[b]
+        solid = (right > left) & (bottom > top)
+        keep = (top[a] < bottom[b]) & (top[b] < bottom[a]) & solid[a] & solid[b]
+        self.pair_a, self.pair_b = a[keep], b[keep]
+        return self
+
+    def pairs(self, group_a, group_b):
+        """(owner_a, owner_b) for every touching pair, in the order they were added"""
+        ga = self.group[self.pair_a]
+        gb = self.group[self.pair_b]
+        forward = (ga == group_a) & (gb == group_b)
+        if group_a == group_b:
+            a, b = self.pair_a[forward], self.pair_b[forward]
+        else:
+            backward = (ga == group_b) & (gb == group_a)
+            a = np.concatenate((self.pair_a[forward], self.pair_b[backward]))
+            b = np.concatenate((self.pair_b[forward], self.pair_a[backward]))
+        order = np.lexsort((b, a))
+        owners = self.owners
+        return [(owners[i], owners[j]) for i, j in zip(a[order].tolist(), b[order].tolist())]
+
+
+Sense = namedtuple("Sense", "dist_sq dx dy dir_x dir_y in_agro in_shoot in_melee")
+
+
+class Perception:
+    """Batched distance, direction and range checks from enemies to the player
+
+    update() packs every enemy position into one array and returns a Sense
+    row per enemy, in group order, for its state machine to read.
+    """
+
+    def __init__(self):
+        self.members = ()
+        self.ranges_sq = np.zeros((0, 3))
+
+    def update(self, enemies, player):
+        members = tuple(enemies)
+        if not members:
+            return []
 
-        if pygame.time.get_ticks() - self.spawn_time > self.lifetime:
-            self.kill()
+        if members != self.members:
+            self.members = members
+            self.ranges_sq = np.array([(e.agro_distance, e.shoot_range, e.melee_range) for e in members],
+                                      dtype=float) ** 2
+
+        positions = np.array([e.rect.center for e in members], dtype=float)
+        delta = np.array(player.rect.center, dtype=float) - positions
+        dist_sq = np.einsum("ij,ij->i", delta, delta)
+        dist = np.sqrt(dist_sq)
+        direction = delta / np.where(dist > 0, dist, 1)[:, None]
+        in_range = dist_sq[:, None] < self.ranges_sq
+
+        table = np.column_stack((dist_sq, delta, direction, in_range))
+        return [Sense._make(row) for row in table.tolist()]
+
+    @classmethod
+    def sense(cls, enemy, player):
+        return cls().update([enemy], player)[0]
+
+
+class ThinkScheduler:
+    """Decides which enemies run their state machine on a given step
+
+    Enemies in combat or with the player inside one of their ranges think
+    every step, idle ones every AI_PATROL_INTERVAL steps and distant ones
+    every AI_FAR_INTERVAL. Each enemy gets its own phase so the thinking is
+    spread evenly over the steps. Motion still runs every step.
+    """
+
+    def __init__(self):
+        self.step = 0
+        self.next_phase = 0
+
+    def tick(self):
+        self.step += 1
+
+    def interval(self, enemy, sense):
+        if enemy.in_combat() or sense.in_agro or sense.in_shoot or sense.in_melee:
+            return 1
+        if sense.dist_sq > AI_FAR_DISTANCE ** 2:
+            return AI_FAR_INTERVAL
+        return AI_PATROL_INTERVAL
+
+    def due(self, enemy, sense):
+        if enemy.think_phase is None:
+            enemy.think_phase = self.next_phase
+            self.next_phase += 1
+        return (self.step + enemy.think_phase) % self.interval(enemy, sense) == 0
 
 
 class BaseEnemy(pygame.sprite.Sprite):
     def __init__(self, x, y, color, width=24, height=32):
         super().__init__()
+        self.asset_keys = []
         self.animations = self.load_animations()
+        self.animations_left = self.load_animations(flip=True)
         self.current_state = "idle"
         self.current_frame = 0
         self.animation_speed = 150
@@ -467,7 +1369,7 @@ class BaseEnemy(pygame.sprite.Sprite):
         self.image = self.animations[self.current_state][self.current_frame]
         self.prev_state = "idle"
 
-        self.rect = self.image.get_rect(topleft=(x, y))
+        self.rect = pygame.Rect((x, y), self.image.full_size)
 
         hitbox_width = width * 0.8
         hitbox_height = height * 0.9
@@ -480,20 +1382,23 @@ class BaseEnemy(pygame.sprite.Sprite):
         self.last_hit_time = 0
         self.direction = pygame.math.Vector2(0, 0)
         self.speed = 1.5
+        self.agro_distance = 0
+        self.shoot_range = 0
+        self.melee_range = 0
+        self.think_phase = None
         self.velocity_y = 0
         self.on_ground = False
         self.facing_right = True
-        self.hit_timer = 0
-        self.invincible = False
-        self.invincibility_timer = 0
+        self.hit_timer = None
+        self.invincible = None
         self.invincibility_duration = 500
 
         self.knockback_velocity = pygame.math.Vector2(0, 0)
-        self.knockback_timer = 0
-        self.stunned = False
-        self.stun_timer = 0
+        self.knockback_timer = None
+        self.stunned = None
+        self.striking = False  # Charge or melee lunge active this step
 
-    def load_animations(self):
+    def load_animations(self, flip=False):
         animations = {
             "idle": self.create_placeholder_animation(4, (255, 0, 0)),
             "move": self.create_placeholder_animation(4, (200, 0, 0)),
@@ -502,34 +1407,17 @@ class BaseEnemy(pygame.sprite.Sprite):
         }
         return animations
 
-    def load_spritesheet(self, filename, frame_width, frame_height, scale_factor=1.0):
+    def load_spritesheet(self, filename, frame_width, frame_height, scale_factor=1.0, flip=False):
         try:
-            sheet = pygame.image.load(filename).convert_alpha()
+            return assets.frames(filename, frame_width, frame_height, scale_factor, flip, self.asset_keys)
         except FileNotFoundError:
             print(f"Spritesheet '{filename}' not found. Using placeholder.")
             return self.create_placeholder_animation(4, (255, 0, 0))
 
-        frame_count = sheet.get_height() // frame_height
-        frames = []
-
-        scaled_width = int(frame_width * scale_factor)
-        scaled_height = int(frame_height * scale_factor)
-
-        for i in range(frame_count):
-            frame = pygame.Surface((frame_width, frame_height), pygame.SRCALPHA)
-            frame.blit(sheet, (0, 0), (0, i * frame_height, frame_width, frame_height))
-
-            if scale_factor != 1.0:
-                frame = pygame.transform.scale(frame, (scaled_width, scaled_height))
-
-            frames.append(frame)
-
-        return frames
-
     def create_placeholder_animation(self, frame_count, color):
         frames = []
         for i in range(frame_count):
-            surf = pygame.Surface((24, 32), pygame.SRCALPHA)
+            surf = Frame((24, 32))
             frame_color = (
                 min(255, color[0] + i * 10),
                 min(255, color[1] + i * 10),
@@ -540,7 +1428,17 @@ class BaseEnemy(pygame.sprite.Sprite):
             frames.append(surf)
         return frames
 
-    def update(self, player, tiles, dt, current_time=None):
+    def in_combat(self):
+        return False
+
+    def think(self, player, current_time, sense=None):
+        pass
+
+    def strike(self, player, current_time):
+        """Attack damage for a striking enemy the broadphase found touching the player"""
+        pass
+
+    def update(self, player, tiles, dt, current_time=None, sense=None, think=True):
         if current_time is None:
             current_time = pygame.time.get_ticks()
 
@@ -548,14 +1446,6 @@ class BaseEnemy(pygame.sprite.Sprite):
 
         self.animation_timer += dt
 
-        if self.invincible:
-            self.invincibility_timer -= dt
-            if self.invincibility_timer <= 0:
-                self.invincible = False
-
-        if self.hit_timer > 0:
-            self.hit_timer -= dt
-
         self.apply_gravity(tiles)
 
         if self.direction.x > 0:
@@ -574,12 +1464,11 @@ class BaseEnemy(pygame.sprite.Sprite):
             self.apply_gravity(tiles)
             return
 
+        animations = self.animations if self.facing_right else self.animations_left
         try:
-            self.image = self.animations[self.current_state][self.current_frame]
+            self.image = animations[self.current_state][self.current_frame]
         except Exception:
             pass
-        if not self.facing_right:
-            self.image = pygame.transform.flip(self.image, True, False)
 
         self.prev_state = self.current_state
 
@@ -591,24 +1480,13 @@ class BaseEnemy(pygame.sprite.Sprite):
         self.collide_vertical(tiles)
 
     def update_knockback_stun(self, dt):
-        if self.knockback_timer > 0:
+        if self.knockback_timer:
             self.rect.x += self.knockback_velocity.x
             self.rect.y += self.knockback_velocity.y
             self.hitbox.centerx = self.rect.centerx
             self.hitbox.bottom = self.rect.bottom
 
             self.knockback_velocity *= 0.9
-            self.knockback_timer -= dt
-
-            if self.knockback_timer <= 0:
-                self.stunned = True
-                self.stun_timer = STUN_DURATION
-                self.knockback_velocity = pygame.math.Vector2(0, 0)
-
-        if self.stunned:
-            self.stun_timer -= dt
-            if self.stun_timer <= 0:
-                self.stunned = False
 
         if self.stunned:
             self.current_state = "hit"
@@ -624,12 +1502,16 @@ class BaseEnemy(pygame.sprite.Sprite):
 
         # Apply force
         self.knockback_velocity = direction * force
-        self.knockback_timer = KNOCKBACK_DURATION
+        self.knockback_timer = timers.restart(self.knockback_timer, KNOCKBACK_DURATION, self.end_knockback)
         self.velocity_y = 0
-        self.hit_timer = 300
+        self.hit_timer = timers.restart(self.hit_timer, 300)
+
+    def end_knockback(self):
+        self.stunned = timers.restart(self.stunned, STUN_DURATION)
+        self.knockback_velocity = pygame.math.Vector2(0, 0)
 
     def update_animation_state(self):
-        if self.hit_timer > 0:
+        if self.hit_timer:
             self.current_state = "hit"
             return
 
@@ -640,26 +1522,27 @@ class BaseEnemy(pygame.sprite.Sprite):
 
     def collide_vertical(self, tiles):
         self.on_ground = False
-        for tile in tiles:
-            if self.hitbox.colliderect(tile.rect):
+        for tile_rect in tiles.query(self.hitbox):
+            if self.hitbox.colliderect(tile_rect):
                 if self.velocity_y > 0:
-                    self.hitbox.bottom = tile.rect.top
+                    self.hitbox.bottom = tile_rect.top
                     self.rect.bottom = self.hitbox.bottom
                     self.on_ground = True
                     self.velocity_y = 0
                 elif self.velocity_y < 0:
-                    self.hitbox.top = tile.rect.bottom
+                    self.hitbox.top = tile_rect.bottom
                     self.rect.top = self.hitbox.top
                     self.velocity_y = 0
 
     def take_damage(self, amount, source_x, source_y):
         if not self.invincible:
             self.health -= amount
-            self.invincible = True
-            self.invincibility_timer = self.invincibility_duration
-            self.hit_timer = 300  # Show hit animation for 300ms
+            self.invincible = timers.restart(self.invincible, self.invincibility_duration)
+            self.hit_timer = timers.restart(self.hit_timer, 300)  # Show hit animation for 300ms
             self.apply_knockback(source_x, source_y)
             if self.health <= 0:
+                assets.release(self.asset_keys)
+                self.asset_keys = []
                 self.kill()
 
 
@@ -667,13 +1550,6 @@ class ChargerEnemy(BaseEnemy):
     def __init__(self, x, y):
         super().__init__(x, y, (200, 50, 50), 36, 76)  # Red enemy (slightly larger)
 
-        self.animations = self.load_animations()
-        try:
-            self.image = self.animations[self.current_state][self.current_frame]
-        except Exception:
-            pass
-        self.rect = self.image.get_rect(topleft=(x, y))
-
         self.state = "patrol"  # patrol, charge, cooldown
         self.patrol_range = 2 * TILE_SIZE
         self.patrol_direction = 1  # 1 for right, -1 for left
@@ -688,13 +1564,13 @@ class ChargerEnemy(BaseEnemy):
         self.last_attack_time = 0
         self.patrol_speed = 1.5
 
-    def load_animations(self):
+    def load_animations(self, flip=False):
         try:
             animations = {
-                "idle": self.load_spritesheet("img/goon_idle.png", 49, 256, 0.7),
-                "move": self.load_spritesheet("img/goon_walk.png", 62, 256, 0.7),
-                "charge": self.load_spritesheet("img/goon_atack.png", 136, 256, 0.7),
-                "hit": self.load_spritesheet("img/goon_hit.png", 112, 256, 0.7)
+                "idle": self.load_spritesheet("img/goon_idle.png", 49, 256, 0.7, flip),
+                "move": self.load_spritesheet("img/goon_walk.png", 62, 256, 0.7, flip),
+                "charge": self.load_spritesheet("img/goon_atack.png", 136, 256, 0.7, flip),
+                "hit": self.load_spritesheet("img/goon_hit.png", 112, 256, 0.7, flip)
             }
         except:
             animations = {
@@ -705,26 +1581,17 @@ class ChargerEnemy(BaseEnemy):
             }
         return animations
 
-    def update(self, player, tiles, dt, current_time=None):
-        if current_time is None:
-            current_time = pygame.time.get_ticks()
-
-        if self.stunned:
-            super().update(player, tiles, dt, current_time)
-            return
-
-        prev_state = self.state
+    def in_combat(self):
+        return self.state != "patrol"
 
-        dist_to_player = math.sqrt((self.rect.centerx - player.rect.centerx) ** 2 +
-                                   (self.rect.centery - player.rect.centery) ** 2)
+    def think(self, player, current_time, sense=None):
+        if sense is None:
+            sense = Perception.sense(self, player)
 
         if self.state == "patrol":
-            if dist_to_player < self.agro_distance:
+            if sense.in_agro:
                 self.state = "charge"
-                self.charge_direction = pygame.math.Vector2(player.rect.centerx - self.rect.centerx,
-                                                            player.rect.centery - self.rect.centery)
-                if self.charge_direction.length() > 0:
-                    self.charge_direction = self.charge_direction.normalize()
+                self.charge_direction = pygame.math.Vector2(sense.dir_x, sense.dir_y)
                 self.last_charge_time = current_time
         elif self.state == "charge":
             if current_time - self.last_charge_time > 1000:  # Charge for 1 second
@@ -733,11 +1600,23 @@ class ChargerEnemy(BaseEnemy):
         elif self.state == "cooldown":
             if current_time - self.last_charge_time > self.charge_cooldown:
                 self.state = "patrol"
-                if player.rect.centerx > self.rect.centerx:
+                if sense.dx > 0:
                     self.patrol_direction = -1
                 else:
                     self.patrol_direction = 1
 
+    def update(self, player, tiles, dt, current_time=None, sense=None, think=True):
+        if current_time is None:
+            current_time = pygame.time.get_ticks()
+
+        self.striking = False
+        if self.stunned:
+            super().update(player, tiles, dt, current_time)
+            return
+
+        if think:
+            self.think(player, current_time, sense)
+
         if self.state == "patrol":
             if abs(self.rect.x - self.start_x) >= self.patrol_range:
                 self.patrol_direction *= -1
@@ -746,24 +1625,26 @@ class ChargerEnemy(BaseEnemy):
             self.rect.x += self.direction.x * self.patrol_speed
             self.hitbox.centerx = self.rect.centerx
 
-            self.collide_horizontal(tiles)
+            self.collide_horizontal(tiles, current_time)
 
         elif self.state == "charge":
             self.rect.x += self.charge_direction.x * self.charge_speed
             self.rect.y += self.charge_direction.y * self.charge_speed
             self.hitbox.centerx = self.rect.centerx
             self.hitbox.centery = self.rect.centery
-
-            if self.hitbox.colliderect(player.hitbox) and current_time - self.last_attack_time > self.attack_cooldown:
-                player.take_damage(self.charge_damage, self.rect.centerx, self.rect.centery)
-                self.last_attack_time = current_time
+            self.striking = True
 
         super().update(player, tiles, dt, current_time)
 
         self.update_animation_state()
 
+    def strike(self, player, current_time):
+        if current_time - self.last_attack_time > self.attack_cooldown:
+            player.take_damage(self.charge_damage, self.rect.centerx, self.rect.centery)
+            self.last_attack_time = current_time
+
     def update_animation_state(self):
-        if self.hit_timer > 0:
+        if self.hit_timer:
             self.current_state = "hit"
         elif self.state == "charge":
             self.current_state = "charge"
@@ -772,18 +1653,21 @@ class ChargerEnemy(BaseEnemy):
         else:
             self.current_state = "idle"
 
-    def collide_horizontal(self, tiles):
-        for tile in tiles:
-            if self.hitbox.colliderect(tile.rect):
+    def collide_horizontal(self, tiles, current_time=None):
+        if current_time is None:
+            current_time = pygame.time.get_ticks()
+
+        for tile_rect in tiles.query(self.hitbox):
+            if self.hitbox.colliderect(tile_rect):
                 if self.state == "charge":
                     self.state = "cooldown"
-                    self.last_charge_time = pygame.time.get_ticks()
+                    self.last_charge_time = current_time
 
                 if self.direction.x > 0:
-                    self.hitbox.right = tile.rect.left
+                    self.hitbox.right = tile_rect.left
                     self.patrol_direction *= -1
                 elif self.direction.x < 0:
-                    self.hitbox.left = tile.rect.right
+                    self.hitbox.left = tile_rect.right
                     self.patrol_direction *= -1
                 self.rect.centerx = self.hitbox.centerx
 
@@ -792,28 +1676,20 @@ class ShooterEnemy(BaseEnemy):
     def __init__(self, x, y):
         super().__init__(x, y, (50, 50, 200), 24, 64)  # Blue enemy
 
-        self.animations = self.load_animations()
-        try:
-            self.image = self.animations[self.current_state][self.current_frame]
-        except Exception:
-            pass
-        self.rect = self.image.get_rect(topleft=(x, y))
-
         self.shoot_cooldown = 2000  # ms
         self.last_shot_time = 0
         self.projectile_speed = 4
         self.projectile_damage = 20
         self.shoot_range = 400
-        self.projectiles = pygame.sprite.Group()
         self.attack_animation_duration = 300  # ms
         self.attack_start_time = 0
 
-    def load_animations(self):
+    def load_animations(self, flip=False):
         try:
             animations = {
-                "idle": self.load_spritesheet("img/shooter_idle.png", 38, 256, 0.7),
-                "shoot": self.load_spritesheet("img/shooter_shot.png", 48, 256, 0.7),
-                "hit": self.load_spritesheet("img/shooter_hit.png", 58, 256, 0.7)
+                "idle": self.load_spritesheet("img/shooter_idle.png", 38, 256, 0.7, flip),
+                "shoot": self.load_spritesheet("img/shooter_shot.png", 48, 256, 0.7, flip),
+                "hit": self.load_spritesheet("img/shooter_hit.png", 58, 256, 0.7, flip)
             }
         except:
             animations = {
@@ -823,18 +1699,11 @@ class ShooterEnemy(BaseEnemy):
             }
         return animations
 
-    def update(self, player, tiles, dt, current_time=None):
-        if current_time is None:
-            current_time = pygame.time.get_ticks()
-
-        self.direction.x = 0
-
-        super().update(player, tiles, dt, current_time)
+    def think(self, player, current_time, sense=None):
+        if sense is None:
+            sense = Perception.sense(self, player)
 
-        dist_to_player = math.sqrt((self.rect.centerx - player.rect.centerx) ** 2 +
-                                   (self.rect.centery - player.rect.centery) ** 2)
-
-        if (dist_to_player < self.shoot_range and
+        if (sense.in_shoot and
                 current_time - self.last_shot_time > self.shoot_cooldown and
                 self.current_state != "shoot"):
             self.current_state = "shoot"
@@ -844,20 +1713,29 @@ class ShooterEnemy(BaseEnemy):
             self.attack_start_time = current_time
             self.shoot(player)
 
+    def update(self, player, tiles, dt, current_time=None, sense=None, think=True):
+        if current_time is None:
+            current_time = pygame.time.get_ticks()
+
+        self.direction.x = 0
+
+        super().update(player, tiles, dt, current_time)
+
+        if think:
+            self.think(player, current_time, sense)
+
         if (self.current_state == "shoot" and
                 current_time - self.attack_start_time > self.attack_animation_duration):
             self.current_state = "idle"
             self.current_frame = 0
             self.animation_timer = 0
 
-        self.projectiles.update(dt)
-
         if self.stunned:
             super().update(player, tiles, dt, current_time)
             return
 
     def update_animation_state(self):
-        if self.hit_timer > 0:
+        if self.hit_timer:
             self.current_state = "hit"
 
     def shoot(self, player):
@@ -866,7 +1744,7 @@ class ShooterEnemy(BaseEnemy):
         if direction.length() > 0:
             direction = direction.normalize()
 
-        projectile = Projectile(
+        projectile_pool.spawn(
             self.rect.centerx,
             self.rect.centery,
             direction,
@@ -874,21 +1752,12 @@ class ShooterEnemy(BaseEnemy):
             self.projectile_damage,
             BLUE
         )
-        self.projectiles.add(projectile)
 
 
 class HybridEnemy(BaseEnemy):
     def __init__(self, x, y):
         super().__init__(x, y, (150, 50, 150), 28, 36)  # Purple enemy (slightly larger)
 
-        # Load custom animations
-        self.animations = self.load_animations()
-        try:
-            self.image = self.animations[self.current_state][self.current_frame]
-        except Exception:
-            pass
-        self.rect = self.image.get_rect(topleft=(x, y))
-
         # Hybrid-specific properties
         self.state = "idle"  # idle, melee, shoot
         self.melee_range = 60
@@ -898,21 +1767,20 @@ class HybridEnemy(BaseEnemy):
         self.projectile_speed = 3
         self.attack_cooldown = 1500  # ms
         self.last_attack_time = 0
-        self.projectiles = pygame.sprite.Group()
         self.charge_speed = 4
         self.charge_direction = pygame.math.Vector2(0, 0)
         self.charge_duration = 400  # ms
         self.charge_start_time = 0
         self.attack_animation_duration = 500  # ms
 
-    def load_animations(self):
+    def load_animations(self, flip=False):
         try:
             animations = {
-                "idle": self.load_spritesheet("hybrid_idle.png", 28, 36),
-                "move": self.load_spritesheet("hybrid_move.png", 28, 36),
-                "melee": self.load_spritesheet("hybrid_melee.png", 36, 36),
-                "shoot": self.load_spritesheet("hybrid_shoot.png", 32, 36),
-                "hit": self.load_spritesheet("hybrid_hit.png", 28, 36)
+                "idle": self.load_spritesheet("hybrid_idle.png", 28, 36, flip=flip),
+                "move": self.load_spritesheet("hybrid_move.png", 28, 36, flip=flip),
+                "melee": self.load_spritesheet("hybrid_melee.png", 36, 36, flip=flip),
+                "shoot": self.load_spritesheet("hybrid_shoot.png", 32, 36, flip=flip),
+                "hit": self.load_spritesheet("hybrid_hit.png", 28, 36, flip=flip)
             }
         except:
             animations = {
@@ -924,33 +1792,20 @@ class HybridEnemy(BaseEnemy):
             }
         return animations
 
-    def update(self, player, tiles, dt, current_time=None):
-        if current_time is None:
-            current_time = pygame.time.get_ticks()
-
-        if self.stunned:
-            super().update(player, tiles, dt, current_time)
-            return
+    def in_combat(self):
+        return self.state != "idle"
 
-        prev_state = self.state
-
-        super().update(player, tiles, dt, current_time)
-
-        self.projectiles.update(dt)
-
-        dist_to_player = math.sqrt((self.rect.centerx - player.rect.centerx) ** 2 +
-                                   (self.rect.centery - player.rect.centery) ** 2)
+    def think(self, player, current_time, sense=None):
+        if sense is None:
+            sense = Perception.sense(self, player)
 
         if self.state == "idle":
-            if dist_to_player < self.melee_range:
+            if sense.in_melee:
                 self.state = "melee"
-                self.charge_direction = pygame.math.Vector2(player.rect.centerx - self.rect.centerx,
-                                                            player.rect.centery - self.rect.centery)
-                if self.charge_direction.length() > 0:
-                    self.charge_direction = self.charge_direction.normalize()
+                self.charge_direction = pygame.math.Vector2(sense.dir_x, sense.dir_y)
                 self.charge_start_time = current_time
                 self.last_attack_time = current_time
-            elif dist_to_player < self.shoot_range:
+            elif sense.in_shoot:
                 self.state = "shoot"
                 self.last_attack_time = current_time
                 self.attack_start_time = current_time
@@ -961,15 +1816,28 @@ class HybridEnemy(BaseEnemy):
             if current_time - self.attack_start_time > self.attack_animation_duration:
                 self.state = "idle"
 
+    def update(self, player, tiles, dt, current_time=None, sense=None, think=True):
+        if current_time is None:
+            current_time = pygame.time.get_ticks()
+
+        self.striking = False
+        if self.stunned:
+            super().update(player, tiles, dt, current_time)
+            return
+
+        prev_state = self.state
+
+        super().update(player, tiles, dt, current_time)
+
+        if think:
+            self.think(player, current_time, sense)
+
         if self.state == "melee":
             self.rect.x += self.charge_direction.x * self.charge_speed
             self.rect.y += self.charge_direction.y * self.charge_speed
             self.hitbox.centerx = self.rect.centerx
             self.hitbox.centery = self.rect.centery
-
-            if self.hitbox.colliderect(player.hitbox):
-                player.take_damage(self.melee_damage, self.rect.centerx, self.rect.centery)
-                self.state = "idle"
+            self.striking = True
         elif self.state == "shoot" and current_time - self.attack_start_time > 100:
             if prev_state != "shoot":
                 direction = pygame.math.Vector2(player.rect.centerx - self.rect.centerx,
@@ -978,7 +1846,7 @@ class HybridEnemy(BaseEnemy):
                     direction = direction.normalize()
 
                 # Create projectile
-                projectile = Projectile(
+                projectile_pool.spawn(
                     self.rect.centerx,
                     self.rect.centery,
                     direction,
@@ -987,12 +1855,15 @@ class HybridEnemy(BaseEnemy):
                     PURPLE,
                     (8, 8)
                 )
-                self.projectiles.add(projectile)
 
         self.update_animation_state()
 
+    def strike(self, player, current_time):
+        player.take_damage(self.melee_damage, self.rect.centerx, self.rect.centery)
+        self.state = "idle"
+
     def update_animation_state(self):
-        if self.hit_timer > 0:
+        if self.hit_timer:
             self.current_state = "hit"
         elif self.state == "melee":
             self.current_state = "melee"
@@ -1004,6 +1875,89 @@ class HybridEnemy(BaseEnemy):
             self.current_state = "idle"
 
 
+class ActivityZone:
+    """Keeps only enemies near the camera awake
+
+    Enemies that leave the viewport plus margin are parked, untouched, in
+    columns of ACTIVITY_CELL_WIDTH and skipped by the simulation. Each step
+    only the awake enemies and the columns overlapping the zone are
+    checked, so the cost follows what is near the player rather than how
+    many enemies the level holds.
+    """
+
+    def __init__(self, enemies=(), margin=ACTIVITY_MARGIN, cell_width=ACTIVITY_CELL_WIDTH):
+        self.margin = margin
+        self.cell_width = cell_width
+        self.active = list(enemies)
+        self.sleeping = {}
+
+    def zone(self, camera):
+        margin_x, margin_y = self.margin
+        return pygame.Rect(-camera.camera.x - margin_x, -camera.camera.y - margin_y,
+                           SCREEN_WIDTH + 2 * margin_x, SCREEN_HEIGHT + 2 * margin_y)
+
+    def update(self, camera):
+        zone = self.zone(camera)
+
+        active = []
+        for enemy in self.active:
+            if not enemy.alive():
+                continue
+            if zone.colliderect(enemy.hitbox):
+                active.append(enemy)
+            else:
+                self.sleeping.setdefault(enemy.hitbox.centerx // self.cell_width, []).append(enemy)
+
+        for column in range(zone.left // self.cell_width, zone.right // self.cell_width + 1):
+            bucket = self.sleeping.get(column)
+            if not bucket:
+                continue
+            asleep = []
+            for enemy in bucket:
+                if zone.colliderect(enemy.hitbox):
+                    active.append(enemy)
+                elif enemy.alive():
+                    asleep.append(enemy)
+            if asleep:
+                self.sleeping[column] = asleep
+            else:
+                del self.sleeping[column]
+
+        self.active = active
+        return active
+
+
+class DrawList:
+    """Blit commands for one frame, bucketed by layer
+
+    Systems add (surface, world position) pairs while the frame is assembled.
+    draw() culls them against the camera viewport and submits each layer,
+    lowest first, with a single Surface.blits call.
+    """
+
+    def __init__(self, layers=LAYER_COUNT):
+        self.layers = [[] for _ in range(layers)]
+
+    def add(self, surface, pos, layer):
+        self.layers[layer].append((surface, pos))
+
+    def extend(self, commands, layer):
+        self.layers[layer].extend(commands)
+
+    def draw(self, screen, camera):
+        view = camera.viewport()
+        left, top, right, bottom = view.left, view.top, view.right, view.bottom
+        offset_x, offset_y = camera.offset
+        for commands in self.layers:
+            if not commands:
+                continue
+            screen.blits([(surface, (x + offset_x, y + offset_y)) for surface, (x, y) in commands
+                          if x < right and y < bottom and
+                          x + surface.get_width() > left and y + surface.get_height() > top],
+                         doreturn=False)
+            commands.clear()
+
+
 class Camera:
     def __init__(self, width, height):
         self.camera = pygame.Rect(0, 0, width, height)
@@ -1012,16 +1966,43 @@ class Camera:
         self.vertical_deadzone = 100
         self.smoothness = 0.1
 
-    def apply(self, entity):
-        return entity.rect.move(self.camera.topleft)
-
-    def apply_point(self, point):
-        return (point[0] + self.camera.x, point[1] + self.camera.y)
-
-    def apply_rect(self, rect):
-        return rect.move(self.camera.topleft)
+        # Render-time interpolation between the last two simulation steps
+        self.prev_topleft = self.camera.topleft
+        self.alpha = 1.0
+        self.offset = self.camera.topleft
+
+    def interpolate(self, alpha):
+        self.alpha = alpha
+        self.offset = lerp_point(self.prev_topleft, self.camera.topleft, alpha)
+
+    def motion(self, entity):
+        # Shift from the entity's latest position back towards where it was
+        # one step ago, so it is drawn at the same moment as the camera
+        prev = getattr(entity, "prev_pos", None)
+        if prev is None:
+            return 0, 0
+        return (round((prev[0] - entity.rect.x) * (1 - self.alpha)),
+                round((prev[1] - entity.rect.y) * (1 - self.alpha)))
+
+    def position(self, entity):
+        """World position to draw entity.image at this frame"""
+        offset = getattr(entity.image, "offset", (0, 0))
+        motion = self.motion(entity)
+        return (entity.rect.x + motion[0] + offset[0],
+                entity.rect.y + motion[1] + offset[1])
+
+    def apply_point(self, point, entity=None):
+        motion = self.motion(entity) if entity is not None else (0, 0)
+        return (point[0] + self.offset[0] + motion[0], point[1] + self.offset[1] + motion[1])
+
+    def apply_rect(self, rect, entity=None):
+        return rect.move(self.apply_point((0, 0), entity))
+
+    def viewport(self):
+        return pygame.Rect(-self.offset[0], -self.offset[1], SCREEN_WIDTH, SCREEN_HEIGHT)
 
     def update(self, target):
+        self.prev_topleft = self.camera.topleft
         x = -target.rect.centerx + SCREEN_WIDTH // 2
 
         target_center_y = target.rect.centery
@@ -1044,52 +2025,97 @@ class Camera:
         y = max(-(self.height - SCREEN_HEIGHT), y)
 
         self.camera = pygame.Rect(x, y, self.width, self.height)
+        self.offset = self.camera.topleft
 
 
-class Background:
-    def __init__(self, image_path, scroll_speed):
-        self.image = pygame.image.load(image_path).convert_alpha()
-        img_width = int(self.image.get_width() * (SCREEN_HEIGHT / self.image.get_height()))
-        self.image = pygame.transform.scale(self.image, (img_width, SCREEN_HEIGHT))
+class ParallaxLayer:
+    """Wrapping strip for one or more background images sharing a scroll speed
+
+    The images are composited once, back to front, into a strip that repeats
+    its first screen-width at the end, so whatever part of the wrap is on
+    screen is one contiguous area drawn with a single blit. Strips whose
+    bottom image has no alpha channel stay opaque in the display format.
+    """
+
+    def __init__(self, images, scroll_speed):
+        self.width = images[0].get_width()
+        height = max(image.get_height() for image in images)
+        opaque = not images[0].get_flags() & pygame.SRCALPHA
+        self.strip = pygame.Surface((self.width + SCREEN_WIDTH, height), 0 if opaque else pygame.SRCALPHA)
+        for image in images:
+            for x in range(0, self.width + SCREEN_WIDTH, self.width):
+                self.strip.blit(image, (x, 0))
+        self.strip = self.strip.convert() if opaque else self.strip.convert_alpha()
 
-        self.width = self.image.get_width()
         self.scroll_speed = scroll_speed
         self.x = 0
-        self.x2 = self.width
 
     def update(self, player):
         if player.actually_moved_x:
             if player.direction.x > 0:
                 self.x -= self.scroll_speed
-                self.x2 -= self.scroll_speed
             elif player.direction.x < 0:
                 self.x += self.scroll_speed
-                self.x2 += self.scroll_speed
+            self.x %= self.width
 
-        if self.x <= -self.width:
-            self.x = self.width
-        if self.x2 <= -self.width:
-            self.x2 = self.width
-        if self.x >= self.width:
-            self.x = -self.width
-        if self.x2 >= self.width:
-            self.x2 = -self.width
+    def draw(self, screen, camera):
+        left = math.floor(self.x + camera.offset[0] * self.scroll_speed * 0.1)
+        screen.blit(self.strip, (0, 0), (-left % self.width, 0, SCREEN_WIDTH, self.strip.get_height()))
+
+
+class Background:
+    """Parallax layers drawn back to front from (image path, scroll speed) pairs
+
+    Images are scaled to the screen height. Consecutive layers with the same
+    speed and width never move relative to each other and share one strip.
+    """
+
+    def __init__(self, layers):
+        self.layers = []
+        keys = []
+        group = []
+        for image_path, scroll_speed in layers:
+            source = assets.image(image_path, alpha=None, keys=keys)
+            img_width = int(source.get_width() * (SCREEN_HEIGHT / source.get_height()))
+            image = source
+            if source.get_size() != (img_width, SCREEN_HEIGHT):
+                image = assets.image(image_path, (img_width, SCREEN_HEIGHT), alpha=None, keys=keys)
+            if group and (group[0][1] != scroll_speed or group[0][0].get_width() != img_width):
+                self.add_layer(group)
+                group = []
+            group.append((image, scroll_speed))
+        if group:
+            self.add_layer(group)
+        # Only the composited strips are drawn, so drop the decoded images
+        assets.release(keys)
+        assets.evict(keys)
+
+    def add_layer(self, group):
+        self.layers.append(ParallaxLayer([image for image, _ in group], group[0][1]))
+
+    def update(self, player):
+        for layer in self.layers:
+            layer.update(player)
 
     def draw(self, screen, camera):
-        screen.blit(self.image, (self.x + camera.camera.x * self.scroll_speed * 0.1, 0))
-        screen.blit(self.image, (self.x2 + camera.camera.x * self.scroll_speed * 0.1, 0))
+        for layer in self.layers:
+            layer.draw(screen, camera)
+
+
+def lerp_point(prev, current, alpha):
+    return (round(prev[0] + (current[0] - prev[0]) * alpha),
+            round(prev[1] + (current[1] - prev[1]) * alpha))
 
 
 def generate_level():
-    tiles = pygame.sprite.Group()
+    tile_map = TileMap(62, 64, origin_col=-1)
 
     for x in range(0, 60 * TILE_SIZE, TILE_SIZE):
-        tiles.add(Tile(x, 20 * TILE_SIZE, BROWN))
+        tile_map.place_at(x, 20 * TILE_SIZE, TILE_GROUND)
 
     for y in range(0, 64 * TILE_SIZE, TILE_SIZE):
-        tiles.add(Tile(-TILE_SIZE, y, BROWN))
-        for y in range(0, 64 * TILE_SIZE, TILE_SIZE):
-            tiles.add(Tile(60 * TILE_SIZE, y, RED))
+        tile_map.place_at(-TILE_SIZE, y, TILE_GROUND)
+        tile_map.place_at(60 * TILE_SIZE, y, TILE_WALL)
 
     platforms = [
         (5 * TILE_SIZE, 16 * TILE_SIZE, 4),
@@ -1110,7 +2136,7 @@ def generate_level():
 
     for x, y, length in platforms:
         for i in range(length):
-            tiles.add(Tile(x + i * TILE_SIZE, y, GREEN))
+            tile_map.place_at(x + i * TILE_SIZE, y, TILE_PLATFORM)
 
     floating_platforms = [
         (15 * TILE_SIZE, 15 * TILE_SIZE),
@@ -1121,40 +2147,220 @@ def generate_level():
     ]
 
     for x, y in floating_platforms:
-        tiles.add(Tile(x, y, GREEN))
+        tile_map.place_at(x, y, TILE_PLATFORM)
 
     for x in range(25 * TILE_SIZE, 28 * TILE_SIZE, TILE_SIZE):
-        tiles.add(Tile(x, 17 * TILE_SIZE, GREEN))
+        tile_map.place_at(x, 17 * TILE_SIZE, TILE_PLATFORM)
+
+    return tile_map, tile_map.make_grid()
+
+
+health_bars = {}
+
+
+def health_bar_image(health, max_health, width=30, height=5):
+    key = (health, max_health, width, height)
+    image = health_bars.get(key)
+    if image is None:
+        image = pygame.Surface((width, height))
+        image.fill((255, 0, 0))
+        pygame.draw.rect(image, (0, 255, 0), pygame.Rect(0, 0, width * health / max_health, height))
+
+        # Border
+        pygame.draw.rect(image, (50, 50, 50), image.get_rect(), 1)
+        health_bars[key] = image
+    return image
+
+
+class TextCache:
+    """Fonts and rendered text, so drawing text is a lookup plus a blit
+
+    render() keys surfaces on (font name, size, text, color) and drops the
+    least recently used once it holds capacity of them. Strings made only of
+    GLYPHS, like countdowns, scores and counters, skip it: each font, size
+    and color gets one strip with every glyph rendered once, and draw() blits
+    the characters' regions from it, so a new value never rasterizes.
+    """
+
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.strips = {}
+
+    def font(self, size, name=None):
+        key = (name, size)
+        if key not in self.fonts:
+            self.fonts[key] = pygame.font.SysFont(name, size)
+        return self.fonts[key]
+
+    def render(self, text, size, color, name=None):
+        key = (name, size, text, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.font(size, name).render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.capacity:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def glyphs(self, size, color, name=None):
+        key = (name, size, tuple(color))
+        if key not in self.strips:
+            font = self.font(size, name)
+            images = [font.render(char, True, color) for char in GLYPHS]
+            strip = pygame.Surface((sum(image.get_width() for image in images), font.get_height()), pygame.SRCALPHA)
+            areas = {}
+            x = 0
+            for char, image in zip(GLYPHS, images):
+                # MAX onto the cleared strip copies the glyph instead of blending it
+                strip.blit(image, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+                areas[char] = pygame.Rect(x, 0, image.get_width(), strip.get_height())
+                x += image.get_width()
+            self.strips[key] = strip, areas
+        return self.strips[key]
+
+    def width(self, text, size, color, name=None):
+        if all(char in GLYPHS for char in text):
+            _, areas = self.glyphs(size, color, name)
+            return sum(areas[char].width for char in text)
+        return self.render(text, size, color, name).get_width()
+
+    def draw(self, screen, text, pos, size, color, name=None):
+        """Blit text with its top left at pos and return its width"""
+        if not all(char in GLYPHS for char in text):
+            surface = self.render(text, size, color, name)
+            screen.blit(surface, pos)
+            return surface.get_width()
+        strip, areas = self.glyphs(size, color, name)
+        x, y = pos
+        blits = []
+        for char in text:
+            area = areas[char]
+            blits.append((strip, (x, y), area))
+            x += area.width
+        screen.blits(blits, doreturn=False)
+        return x - pos[0]
+
+
+text_cache = TextCache()
+
+
+class Profiler:
+    """Per-phase frame timings in a ring buffer, with an overlay and CSV export
+
+    Code marks the end of each phase with lap(), which charges the time since
+    the previous lap or mark() to that phase; a phase can be lapped more than
+    once per frame and the times add up. Each row of samples is one frame in
+    ms, one column per PHASE_NAMES entry plus the whole frame last. While
+    disabled every call returns straight away.
+    """
+
+    def __init__(self, frames=PROFILE_FRAMES):
+        self.enabled = False
+        self.samples = np.zeros((frames, len(PHASE_NAMES) + 1))
+        self.row = [0.0] * len(PHASE_NAMES)
+        self.index = 0
+        self.count = 0
+        self.start = self.last = 0
+        self.stats = None
+        self.panel = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.stats = None
+        # Toggled mid-frame, so time the rest of this frame from here
+        self.begin_frame()
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.row = [0.0] * len(PHASE_NAMES)
+        self.start = self.last = time.perf_counter()
 
-    return tiles
+    def mark(self):
+        if self.enabled:
+            self.last = time.perf_counter()
 
+    def lap(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.row[phase] += now - self.last
+        self.last = now
 
-def draw_health_bar(screen, camera, entity, x_offset=0, y_offset=-15):
-    health_width = 30
-    health_height = 5
-    health_x = entity.rect.centerx - health_width // 2 + x_offset
+    def end_frame(self):
+        if not self.enabled:
+            return
+        samples = self.samples[self.index]
+        samples[:-1] = self.row
+        samples[-1] = time.perf_counter() - self.start
+        samples *= 1000
+        self.index = (self.index + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+
+    def recorded(self):
+        """Recorded rows, oldest first"""
+        if self.count < len(self.samples):
+            return self.samples[:self.count]
+        return np.roll(self.samples, -self.index, axis=0)
+
+    def percentiles(self):
+        """p50, p95 and p99 rows over everything recorded"""
+        return np.percentile(self.recorded(), [50, 95, 99], axis=0)
+
+    def export(self, path=PROFILE_CSV):
+        np.savetxt(path, self.recorded(), fmt="%.3f", delimiter=",", comments="",
+                   header=",".join(PHASE_NAMES + ["frame"]))
+        print(f"Wrote {self.count} frames of timings to {path}")
+
+    def draw(self, screen):
+        if not self.count:
+            return
+        if self.stats is None or self.index % PROFILE_REFRESH == 0:
+            self.stats = self.percentiles()
+        # One table row per phase plus the whole frame, the graph below them
+        graph_top = 24 + (len(PHASE_NAMES) + 1) * 16 + 8
+        if self.panel is None:
+            self.panel = pygame.Surface((300, graph_top + 90), pygame.SRCALPHA)
+            self.panel.fill((0, 0, 0, 170))
+        x, y = 10, SCREEN_HEIGHT - self.panel.get_height() - 10
+        screen.blit(self.panel, (x, y))
+
+        # p50/p95/p99 in ms per phase, whole frame last
+        text_cache.draw(screen, "ms", (x + 8, y + 6), 18, WHITE)
+        for column, label in enumerate(("p50", "p95", "p99")):
+            text_cache.draw(screen, label, (x + 100 + column * 64, y + 6), 18, WHITE)
+        for row, name in enumerate(PHASE_NAMES + ["frame"]):
+            row_y = y + 24 + row * 16
+            text_cache.draw(screen, name, (x + 8, row_y), 18, YELLOW if name == "frame" else WHITE)
+            for column in range(3):
+                text_cache.draw(screen, f"{self.stats[column][row]:.2f}", (x + 100 + column * 64, row_y), 18, WHITE)
+
+        # Whole frame times, newest on the right, against the frame budget
+        graph = pygame.Rect(x + 8, y + graph_top, 284, 80)
+        budget = 1000 / FPS
+        scale = graph.height / (2 * budget)
+        pygame.draw.line(screen, GREEN, (graph.left, graph.bottom - budget * scale),
+                         (graph.right, graph.bottom - budget * scale))
+        totals = self.recorded()[-graph.width:, -1]
+        if len(totals) > 1:
+            points = [(graph.right - len(totals) + i, graph.bottom - min(total * scale, graph.height))
+                      for i, total in enumerate(totals.tolist())]
+            pygame.draw.lines(screen, YELLOW, False, points)
+
+
+profiler = Profiler()
+
+
+def queue_health_bar(draw_list, camera, entity, x_offset=0, y_offset=-15):
+    image = health_bar_image(entity.health, entity.max_health)
+    health_x = entity.rect.centerx - image.get_width() // 2 + x_offset
     health_y = entity.rect.top + y_offset + 200
-
-    health_rect = pygame.Rect(
-        health_x + camera.camera.x,
-        health_y + camera.camera.y,
-        health_width,
-        health_height
-    )
-
-    pygame.draw.rect(screen, (255, 0, 0), health_rect)
-
-    health_fill_width = health_width * entity.health / entity.max_health
-    health_fill_rect = pygame.Rect(
-        health_rect.x,
-        health_rect.y,
-        health_fill_width,
-        health_height
-    )
-    pygame.draw.rect(screen, (0, 255, 0), health_fill_rect)
-
-    # Border
-    pygame.draw.rect(screen, (50, 50, 50), health_rect, 1)
+    motion = camera.motion(entity)
+    draw_list.add(image, (health_x + motion[0], health_y + motion[1]), LAYER_HEALTH_BARS)
 
 
 class Goal(pygame.sprite.Sprite):
@@ -1191,293 +2397,719 @@ def calculate_rating(player, total_enemies):
         return "D", total_score
 
 
-def show_win_screen(screen, player, total_enemies):
-    """Display the win screen with performance rating"""
-    screen.fill(BLACK)
-    font_large = pygame.font.SysFont(None, 72)
-    font_medium = pygame.font.SysFont(None, 48)
-    font_small = pygame.font.SysFont(None, 36)
-
-    # Calculate rating
-    rating, score = calculate_rating(player, total_enemies)
-
-    # Render text
-    win_text = font_large.render("LEVEL COMPLETE!", True, WHITE)
-    rating_text = font_medium.render(f"Rating: {rating}", True, WHITE)
-    score_text = font_medium.render(f"Score: {score:.1f}/100", True, WHITE)
-    stats_text = font_small.render(
-        f"Health Lost: {player.initial_health - player.health} | Enemies Killed: {player.total_enemies_killed}/{total_enemies}",
-        True, (255, 255, 255)
-    )
-    continue_text = font_small.render("Press any key to continue...", True, WHITE)
-
-    # Position text
-    screen.blit(win_text, (SCREEN_WIDTH // 2 - win_text.get_width() // 2, 150))
-    screen.blit(rating_text, (SCREEN_WIDTH // 2 - rating_text.get_width() // 2, 250))
-    screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, 300))
-    screen.blit(stats_text, (SCREEN_WIDTH // 2 - stats_text.get_width() // 2, 350))
-    screen.blit(continue_text, (SCREEN_WIDTH // 2 - continue_text.get_width() // 2, 450))
-
-    pygame.display.flip()
-
-    # Wait for key press
-    waiting = True
-    while waiting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                waiting = False
-                return True  # Return True to indicate game should restart
-
-
-def main():
-    pygame.mixer.init()
-
-    try:
-        pygame.mixer.music.load(
-            "music/Hotline_Miami_2_Wrong_Number_OST_-_Technoir_76701774.mp3")  # Replace with your file
-        pygame.mixer.music.set_volume(0.3)  # 30% volume for background music
-        pygame.mixer.music.play(-1)  # -1 means loop indefinitely
-    except Exception as e:
-        print(f"Could not load background music: {e}")
-
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption("Neco Adventures")
-    clock = pygame.time.Clock()
-
-    # Font for instructions
-    font = pygame.font.SysFont(None, 24)
-
-    # Load sound files
-    try:
-        win_sound = pygame.mixer.Sound("music/videoplayback.mp3")
-        win_sound.set_volume(0.5)  # 50% volume
-    except Exception as e:
-        print(f"Could not load sound file: {e}")
-        win_sound = None
-
-    # Level setup
-    all_tiles = generate_level()
-    player = Player(100, 300)
-    player_group = pygame.sprite.Group(player)
-
-    # Create goal at the end of the level
-    goal = Goal(58 * TILE_SIZE, 18 * TILE_SIZE)
-    goal_group = pygame.sprite.Group(goal)
-
-    # Camera setup
-    level_width = 60 * TILE_SIZE  # Map width in pixels
-    level_height = 30 * TILE_SIZE  # Map height
-    camera = Camera(level_width, level_height)
-
-    # Create enemies
-    enemies = pygame.sprite.Group()
-
-    chargers_spaw = [
-        ChargerEnemy(19 * TILE_SIZE, 15 * TILE_SIZE),
-        ChargerEnemy(34 * TILE_SIZE, 13 * TILE_SIZE),
-        ChargerEnemy(20 * TILE_SIZE, 4 * TILE_SIZE),
-        ChargerEnemy(36.5 * TILE_SIZE, 9 * TILE_SIZE),
-        ChargerEnemy(49 * TILE_SIZE, 11 * TILE_SIZE),
-        ChargerEnemy(50 * TILE_SIZE, 15 * TILE_SIZE),
-    ]
-    enemies.add(*chargers_spaw)
-    shooters_spawn = [
-        ShooterEnemy(15 * TILE_SIZE, 11 * TILE_SIZE),
-        ShooterEnemy(22 * TILE_SIZE, 9 * TILE_SIZE),
-        ShooterEnemy(28 * TILE_SIZE, 12 * TILE_SIZE),
-        ShooterEnemy(31 * TILE_SIZE, 3 * TILE_SIZE),
-        ShooterEnemy(50 * TILE_SIZE, 5 * TILE_SIZE),
-    ]
-    enemies.add(*shooters_spawn)
-
-    total_enemies = len(enemies)
-
-    background = Background("img/background_level1.png", BACKGROUND_SCROLL_SPEED)
-
-    running = True
-    while running:
-        current_time = pygame.time.get_ticks()
-        dt = clock.tick(FPS)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            # Only process input if player is alive and game not complete
-            if player.is_alive and not player.level_complete and event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    player.jump()
-                if event.key == pygame.K_h:
-                    player.take_hit()
-                if event.key == pygame.K_b:
-                    player.show_hitbox = not player.show_hitbox
-                if event.key == pygame.K_z:
-                    player.attack()
-                if event.key == pygame.K_m:
-                    player.facing_right = not player.facing_right
+class ScriptedInput:
+    """Replays player input from a list of (step, action) pairs
+
+    Actions are "left", "right" and "stop", which set held movement, and
+    "jump" and "attack", which fire once on their step.
+    """
+
+    def __init__(self, actions):
+        self.actions = {}
+        for step, action in actions:
+            self.actions.setdefault(int(step), []).append(action)
+        self.move_x = 0
+
+    @classmethod
+    def from_file(cls, path):
+        actions = []
+        with open(path) as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    step, action = line.split()
+                    actions.append((step, action))
+        return cls(actions)
+
+    def poll(self, step):
+        triggers = []
+        for action in self.actions.get(step, ()):
+            if action == "left":
+                self.move_x = -1
+            elif action == "right":
+                self.move_x = 1
+            elif action == "stop":
+                self.move_x = 0
+            else:
+                triggers.append(action)
+        return self.move_x, triggers
+
+
+def enable_headless():
+    # SDL picks its drivers when a subsystem starts, so restart display and
+    # skip the mixer entirely
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.display.quit()
+    pygame.mixer.quit()
+    pygame.display.init()
+
+
+class Scene:
+    """One screen of the game, run by SceneManager while it is on the stack
+
+    Only the top scene gets input. An overlay scene lets the scene below it
+    keep updating and drawing underneath. A static scene only changes on
+    input, so while it is on top the loop sleeps on the event queue.
+    draw() may return a list of dirty rects to update instead of a flip.
+    """
+
+    overlay = False
+    static = False
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def enter(self):
+        pass
+
+    def exit(self):
+        pass
+
+    def handle_event(self, event):
+        pass
+
+    def update(self, frame_time):
+        pass
+
+    def draw(self, screen):
+        pass
+
+
+class SceneManager:
+    """Scene stack driven by a single loop, plus what the scenes share
+
+    The window and clock live here, fonts and text in text_cache and level
+    resources in assets, so switching or restarting scenes never re-creates
+    the display or reloads anything from disk.
+    """
+
+    def __init__(self, size=(SCREEN_WIDTH, SCREEN_HEIGHT), headless=False, bundle=BUNDLE_PATH):
+        self.headless = headless
+        if not headless:
+            pygame.mixer.init()
+        if bundle:
+            assets.bundle.open(bundle)
+        self.screen = pygame.display.set_mode(size)
+        pygame.display.set_caption("Neco Adventures")
+        self.clock = pygame.time.Clock()
+        self.scenes = []
+        self.changed = False
+        self.loader = None
+
+    def preload(self, images=PRELOAD_IMAGES, sounds=PRELOAD_SOUNDS):
+        """Start decoding files in the background while scenes keep running"""
+        self.loader = AssetLoader(images, sounds)
+
+    def set_mode(self, size):
+        if self.screen.get_size() != tuple(size):
+            self.screen = pygame.display.set_mode(size)
+
+    def top(self):
+        return self.scenes[-1] if self.scenes else None
+
+    def push(self, scene):
+        self.scenes.append(scene)
+        self.changed = True
+        scene.enter()
+
+    def pop(self):
+        scene = self.scenes.pop()
+        self.changed = True
+        scene.exit()
+        return scene
+
+    def replace(self, scene):
+        self.pop()
+        self.push(scene)
+
+    def running(self):
+        """Top scene plus every scene it overlays"""
+        first = len(self.scenes) - 1
+        while first > 0 and self.scenes[first].overlay:
+            first -= 1
+        return self.scenes[first:]
+
+    def run(self):
+        while self.scenes:
+            if self.scenes[-1].static and not self.changed:
+                events = [pygame.event.wait()]
+                events += pygame.event.get()
+                self.clock.tick()
+                frame_time = 0
+            else:
+                frame_time = min(self.clock.tick(FPS), MAX_FRAME_TIME)
+                events = pygame.event.get()
+            self.changed = False
+            profiler.begin_frame()
+
+            for event in events:
+                if event.type == pygame.QUIT:
+                    while self.scenes:
+                        self.pop()
+                    return
+                if event.type == ASSET_LOADED and self.loader:
+                    self.loader.poll()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                    profiler.toggle()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F5 and profiler.count:
+                    profiler.export()
+                self.scenes[-1].handle_event(event)
+                if not self.scenes:
+                    return
+            profiler.lap(PHASE_EVENTS)
+
+            for scene in self.running():
+                scene.update(frame_time)
+            if not self.scenes:
+                return
+
+            dirty = None
+            for scene in self.running():
+                dirty = scene.draw(self.screen)
+            profiler.lap(PHASE_OVERLAYS)
+            if profiler.enabled and not self.scenes[-1].static:
+                profiler.draw(self.screen)
+                profiler.mark()
+            if dirty is None:
+                pygame.display.flip()
+            elif dirty:
+                pygame.display.update(dirty)
+            profiler.lap(PHASE_FLIP)
+            profiler.end_frame()
+
+
+class LoadingScene(Scene):
+    """Progress bar shown until the manager's loader is done, then next()"""
+
+    static = True
+
+    def __init__(self, manager, next_scene):
+        super().__init__(manager)
+        self.next_scene = next_scene
+
+    def update(self, frame_time):
+        loader = self.manager.loader
+        if loader is None or loader.finished():
+            self.manager.replace(self.next_scene())
+
+    def draw(self, screen):
+        width, height = screen.get_size()
+        bar = pygame.Rect(0, 0, width // 2, 12)
+        bar.center = (width // 2, height // 2 + 30)
+        text = text_cache.render("Loading...", 48, WHITE)
+
+        screen.fill(BLACK)
+        screen.blit(text, (width // 2 - text.get_width() // 2, height // 2 - 30))
+        pygame.draw.rect(screen, WHITE, (bar.x, bar.y, bar.width * self.manager.loader.progress(), bar.height))
+        pygame.draw.rect(screen, WHITE, bar, 1)
+
+
+class GameplayScene(Scene):
+    """The level itself: fixed-step simulation plus interpolated rendering
+
+    With a script the player is driven by ScriptedInput instead of the
+    keyboard, which is how headless runs play the level.
+    """
+
+    def __init__(self, manager, script=None):
+        super().__init__(manager)
+        self.script = script
+        self.asset_keys = []
+        headless = manager.headless
+
+        # Level geometry and its baked layers are shared by every restart
+        self.tile_map, self.tile_grid = assets.acquire(("level", 1, "tiles"), generate_level, self.asset_keys)
+        self.tile_layer = None if headless else assets.acquire(
+            ("level", 1, "tile_layer"), lambda: TileLayer(self.tile_map.make_sprites()), self.asset_keys)
+        self.background = None if headless else assets.acquire(
+            ("level", 1, "background"),
+            lambda: Background([("img/background_level1.png", BACKGROUND_SCROLL_SPEED)]), self.asset_keys)
+        self.win_sound = None
+        if not headless:
+            try:
+                self.win_sound = assets.acquire(("music/videoplayback.mp3", "sound"), self.load_win_sound,
+                                                self.asset_keys)
+            except Exception as e:
+                print(f"Could not load sound file: {e}")
+
+        self.draw_list = DrawList()
+        self.show_debug = False
+        counts = ", ".join(f"{TILE_NAMES[tile_id]} {count}"
+                           for tile_id, count in sorted(self.tile_map.counts().items()))
+        self.tile_report = [
+            ("Tiles: ", f"{self.tile_map.count()} ({counts})"),
+            ("Skipped: ", f"{self.tile_map.merged} duplicate, {self.tile_map.rejected} overlapping"),
+        ]
+        self.player = Player(100, 300)
+
+        # Create goal at the end of the level
+        self.goal = Goal(58 * TILE_SIZE, 18 * TILE_SIZE)
+
+        # Camera setup
+        level_width = 60 * TILE_SIZE  # Map width in pixels
+        level_height = 30 * TILE_SIZE  # Map height
+        self.camera = Camera(level_width, level_height)
+
+        self.perception = Perception()
+        self.scheduler = ThinkScheduler()
+        self.broadphase = Broadphase()
+        timers.clear()
+        projectile_pool.clear()
+        projectile_pool.bounds = pygame.Rect(-TILE_SIZE, -level_height, level_width + 2 * TILE_SIZE, 3 * level_height)
+
+        # Create enemies
+        self.enemies = pygame.sprite.Group()
+
+        chargers_spaw = [
+            ChargerEnemy(19 * TILE_SIZE, 15 * TILE_SIZE),
+            ChargerEnemy(34 * TILE_SIZE, 13 * TILE_SIZE),
+            ChargerEnemy(20 * TILE_SIZE, 4 * TILE_SIZE),
+            ChargerEnemy(36.5 * TILE_SIZE, 9 * TILE_SIZE),
+            ChargerEnemy(49 * TILE_SIZE, 11 * TILE_SIZE),
+            ChargerEnemy(50 * TILE_SIZE, 15 * TILE_SIZE),
+        ]
+        self.enemies.add(*chargers_spaw)
+        shooters_spawn = [
+            ShooterEnemy(15 * TILE_SIZE, 11 * TILE_SIZE),
+            ShooterEnemy(22 * TILE_SIZE, 9 * TILE_SIZE),
+            ShooterEnemy(28 * TILE_SIZE, 12 * TILE_SIZE),
+            ShooterEnemy(31 * TILE_SIZE, 3 * TILE_SIZE),
+            ShooterEnemy(50 * TILE_SIZE, 5 * TILE_SIZE),
+        ]
+        self.enemies.add(*shooters_spawn)
+
+        self.total_enemies = len(self.enemies)
+        self.activity = ActivityZone(self.enemies)
+
+        self.sim_time = 0
+        self.step_count = 0
+        self.accumulator = 0
+
+        # Everything a retry has to put back, captured before the first step
+        self.spawned = self.enemies.sprites()
+        stateful = [self.player, self.camera, self.activity, self.scheduler, *self.spawned]
+        if self.background:
+            # The background is shared through the cache, so start it from
+            # the same scroll as a fresh load
+            for layer in self.background.layers:
+                layer.x = 0
+            stateful.extend(self.background.layers)
+        if script:
+            stateful.append(script)
+        self.spawn = Snapshot(stateful)
+
+    def reset(self):
+        """Put the level back to its first step without rebuilding anything"""
+        timers.clear()
+        projectile_pool.clear()
+        # Enemies that died handed their frames back to the cache
+        dead = [enemy for enemy in self.spawned if not enemy.alive()]
+        self.spawn.restore()
+        for enemy in dead:
+            assets.retain(enemy.asset_keys)
+        # Re-add in spawn order so iteration and draw order match a fresh level
+        self.enemies.empty()
+        self.enemies.add(*self.spawned)
+        self.sim_time = 0
+        self.step_count = 0
+        self.accumulator = 0
+
+    @staticmethod
+    def load_win_sound():
+        sound = assets.take("music/videoplayback.mp3", pygame.mixer.Sound)
+        sound.set_volume(0.5)  # 50% volume
+        return sound
+
+    def enter(self):
+        if self.manager.headless:
+            return
+        self.manager.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.play_music()
 
-        # Check if player reached the goal
-        if not player.level_complete and player.hitbox.colliderect(goal.rect):
-            player.level_complete = True
-            if win_sound:
+    def play_music(self):
+        try:
+            pygame.mixer.music.load(
+                "music/Hotline_Miami_2_Wrong_Number_OST_-_Technoir_76701774.mp3")  # Replace with your file
+            pygame.mixer.music.set_volume(0.3)  # 30% volume for background music
+            pygame.mixer.music.play(-1)  # -1 means loop indefinitely
+        except Exception as e:
+            print(f"Could not load background music: {e}")
+
+    def exit(self):
+        assets.release(self.asset_keys)
+        assets.release(self.player.asset_keys)
+        for enemy in self.enemies:
+            assets.release(enemy.asset_keys)
+
+    def handle_event(self, event):
+        player = self.player
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            self.show_debug = not self.show_debug
+        # Only process input if player is alive and game not complete
+        if player.is_alive and not player.level_complete and event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_SPACE:
+                player.jump()
+            if event.key == pygame.K_h:
+                player.take_hit()
+            if event.key == pygame.K_b:
+                player.show_hitbox = not player.show_hitbox
+            if event.key == pygame.K_z:
+                player.attack()
+            if event.key == pygame.K_m:
+                player.facing_right = not player.facing_right
+
+    def update(self, frame_time):
+        player = self.player
+        # Real time feeds the accumulator; the simulation only ever advances
+        # in SIM_STEP increments, so gameplay is the same at any render rate
+        self.accumulator += frame_time
+        while self.accumulator >= SIM_STEP and not player.level_complete:
+            self.accumulator -= SIM_STEP
+            self.step()
+
+        if self.manager.top() is not self:
+            return
+        if player.level_complete:
+            if self.win_sound:
                 try:
                     pygame.mixer.music.stop()
-                    win_sound.play()
+                    self.win_sound.play()
                 except Exception as e:
                     print(f"Could not play sound: {e}")
-            if show_win_screen(screen, player, total_enemies):
-                return main()
-        if player.level_complete:
-            continue
+            self.manager.push(WinScene(self.manager, self))
+        elif not player.is_alive:
+            self.manager.push(DeathScene(self.manager, player))
+
+    def step(self):
+        player = self.player
+        camera = self.camera
+        broadphase = self.broadphase
+        # Derived from the step count so it never drifts off whole steps
+        self.sim_time = (self.step_count + 1) * SIM_STEP
+        current_time = self.sim_time
+        dt = SIM_STEP
+        timers.advance(dt)
+
+        # Check if player reached the goal
+        if not player.level_complete and player.hitbox.colliderect(self.goal.rect):
+            player.level_complete = True
+            return
+
+        # Remember where everything was for render interpolation
+        player.prev_pos = player.rect.topleft
 
         # Only update movement if player is alive
-        if player.is_alive:
+        if self.script:
+            move_x, triggers = self.script.poll(self.step_count)
+            if player.is_alive:
+                if "jump" in triggers:
+                    player.jump()
+                if "attack" in triggers:
+                    player.attack()
+        elif player.is_alive:
             keys = pygame.key.get_pressed()
-            player.direction.x = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
-        else:
-            player.direction.x = 0
+            move_x = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
+        player.direction.x = move_x if player.is_alive else 0
+        profiler.lap(PHASE_EVENTS)
+
+        # Enemies far from the camera sleep with their state untouched
+        awake = self.activity.update(camera)
+        for enemy in awake:
+            enemy.prev_pos = enemy.rect.topleft
+        profiler.lap(PHASE_ACTIVITY)
 
         # Check for attack collisions with enemies
         if player.is_attacking and player.attack_hitbox:
-            for enemy in enemies:
-                if player.attack_hitbox.colliderect(enemy.hitbox):
-                    # Pass player position as source for knockback
-                    enemy.take_damage(1, player.rect.centerx, player.rect.centery)
-                    if enemy.health <= 0:
-                        player.total_enemies_killed += 1
+            broadphase.reset()
+            broadphase.add(player.attack_hitbox, player, BODY_ATTACK)
+            for enemy in awake:
+                broadphase.add(enemy.hitbox, enemy, BODY_ENEMY)
+            for _, enemy in broadphase.sweep().pairs(BODY_ATTACK, BODY_ENEMY):
+                # Pass player position as source for knockback
+                enemy.take_damage(1, player.rect.centerx, player.rect.centery)
+                if enemy.health <= 0:
+                    player.total_enemies_killed += 1
+        profiler.lap(PHASE_CONTACTS)
 
         # Update enemies
-        for enemy in enemies:
-            enemy.update(player, all_tiles, dt, current_time)
-
-            # Check for collisions with player
-            if player.hitbox.colliderect(enemy.hitbox) and current_time - enemy.last_hit_time > enemy.hit_cooldown:
+        senses = self.perception.update(awake, player)
+        for enemy, sense in zip(awake, senses):
+            if not enemy.alive():
+                continue
+            enemy.update(player, self.tile_grid, dt, current_time, sense, self.scheduler.due(enemy, sense))
+
+        self.scheduler.tick()
+        profiler.lap(PHASE_ENEMIES)
+        projectile_pool.update(dt)
+        profiler.lap(PHASE_PROJECTILES)
+
+        broadphase.reset()
+        broadphase.add(player.hitbox, player, BODY_PLAYER)
+        for enemy in awake:
+            if enemy.alive():
+                broadphase.add(enemy.hitbox, enemy, BODY_ENEMY)
+        broadphase.add_projectiles(projectile_pool)
+        broadphase.sweep()
+
+        # Check for collisions with player, charges and lunges first
+        for enemy, _ in broadphase.pairs(BODY_ENEMY, BODY_PLAYER):
+            if enemy.striking:
+                enemy.strike(player, current_time)
+            if current_time - enemy.last_hit_time > enemy.hit_cooldown:
                 # Pass enemy position as source for knockback
                 player.take_damage(15, enemy.rect.centerx, enemy.rect.centery)
                 enemy.last_hit_time = current_time
 
         # Check for projectile collisions with player
-        for enemy in enemies:
-            if hasattr(enemy, 'projectiles'):
-                for projectile in enemy.projectiles:
-                    if projectile.rect.colliderect(player.hitbox):
-                        # Pass projectile position and direction for knockback
-                        player.take_damage(projectile.damage, projectile.rect.centerx, projectile.rect.centery)
-                        projectile.kill()
+        hits = broadphase.pairs(BODY_PROJECTILE, BODY_PLAYER)
+        for damage, x, y in projectile_pool.hit([i for i, _ in hits]):
+            # Pass projectile position for knockback
+            player.take_damage(damage, x, y)
+        profiler.lap(PHASE_CONTACTS)
 
         # Update
-        player.update(all_tiles, dt)
+        player.update(self.tile_grid, dt)
+        profiler.lap(PHASE_PLAYER)
         camera.update(player)
-
-        # Draw
-        background.update(player)
-        background.draw(screen, camera)
-
-        # Draw tiles with camera offset
-        for tile in all_tiles:
-            screen.blit(tile.image, camera.apply(tile))
-
-        # Draw goal
-        screen.blit(goal.image, camera.apply(goal))
-
-        # Draw enemy projectiles
-        for enemy in enemies:
-            if hasattr(enemy, 'projectiles'):
-                for projectile in enemy.projectiles:
-                    screen.blit(projectile.image, camera.apply(projectile))
-
-        # Draw enemies with camera offset
-        for enemy in enemies:
-            screen.blit(enemy.image, camera.apply(enemy))
-            draw_health_bar(screen, camera, enemy)
-
-        # Draw player with camera offset
-        screen.blit(player.image, camera.apply(player))
-        draw_health_bar(screen, camera, player, 0, -20)
-
-        # Draw attack overlay if active
+        profiler.lap(PHASE_CAMERA)
+        if self.background:
+            self.background.update(player)
+        profiler.lap(PHASE_BACKGROUND)
+        self.step_count += 1
+
+    def draw(self, screen):
+        player = self.player
+        camera = self.camera
+        draw_list = self.draw_list
+
+        profiler.mark()
+        camera.interpolate(self.accumulator / SIM_STEP)
+        self.background.draw(screen, camera)
+        profiler.lap(PHASE_BACKGROUND)
+
+        self.tile_layer.queue(draw_list, camera)
+        profiler.lap(PHASE_TILES)
+        draw_list.add(self.goal.image, self.goal.rect.topleft, LAYER_GOAL)
+        projectile_pool.queue(draw_list, camera)
+
+        for enemy in self.enemies:
+            draw_list.add(enemy.image, camera.position(enemy), LAYER_ENEMIES)
+            queue_health_bar(draw_list, camera, enemy)
+
+        draw_list.add(player.image, camera.position(player), LAYER_PLAYER)
+        queue_health_bar(draw_list, camera, player, 0, -20)
+
+        # Attack overlay if active
         if player.current_overlay:
             overlay_sprite = player.get_overlay_sprite(player.current_overlay)
             if overlay_sprite:
                 overlay_pos = player.get_overlay_position()
                 if overlay_pos:
-                    overlay_screen_pos = camera.apply_point(overlay_pos)
-                    overlay_rect = overlay_sprite.get_rect(center=overlay_screen_pos)
-                    screen.blit(overlay_sprite, overlay_rect)
+                    overlay_rect = overlay_sprite.get_rect(center=overlay_pos)
+                    motion = camera.motion(player)
+                    draw_list.add(overlay_sprite, (overlay_rect.x + motion[0], overlay_rect.y + motion[1]),
+                                  LAYER_EFFECTS)
+        profiler.lap(PHASE_ENTITIES)
+
+        draw_list.draw(screen, camera)
+        profiler.lap(PHASE_BLITS)
 
         # Draw hitbox if enabled
         if player.show_hitbox:
-            pygame.draw.rect(screen, BLUE, camera.apply_rect(player.hitbox), 2)
-            for enemy in enemies:
-                pygame.draw.rect(screen, RED, camera.apply_rect(enemy.hitbox), 2)
+            pygame.draw.rect(screen, BLUE, camera.apply_rect(player.hitbox, player), 2)
+            for enemy in self.enemies:
+                pygame.draw.rect(screen, RED, camera.apply_rect(enemy.hitbox, enemy), 2)
 
             # Draw attack hitbox if attacking
             if player.is_attacking and player.attack_hitbox:
-                pygame.draw.rect(screen, YELLOW, camera.apply_rect(player.attack_hitbox), 2)
-
-        # Draw instructions and debug info
-        # debug_info = [
-        #     "Arrow Keys: Move",
-        #     "Space: Jump",
-        #     "Z: Attack",
-        #     "H: Trigger Hit Animation",
-        #     "B: Toggle Hitbox Visibility",
-        #     "M: Toggle Player Direction",
-        #     f"Health: {player.health}/{player.max_health}",
-        #     f"State: {player.current_state}",
-        #     f"Enemies: {len(enemies)}",
-        #     f"Projectiles: {sum(len(enemy.projectiles) for enemy in enemies if hasattr(enemy, 'projectiles'))}",
-        #     f"Facing: {'Right' if player.facing_right else 'Left'}",
-        #     f"Stunned: {'Yes' if player.stunned else 'No'}",
-        #     f"Kills: {player.total_enemies_killed}/{total_enemies}"
-        # ]
-
-        # for i, text in enumerate(debug_info):
-        #     text_surf = font.render(text, True, (50, 50, 50))
-        #     screen.blit(text_surf, (10, 10 + i * 25))
-        #
-        # # Draw enemy info
-        # enemy_info = [
-        #     "ENEMY TYPES:",
-        #     "RED: Charger - Charges when close",
-        #     "BLUE: Shooter - Shoots projectiles",
-        #     "PURPLE: Hybrid - Both melee and ranged"
-        # ]
-        #
-        # for i, text in enumerate(enemy_info):
-        #     text_surf = font.render(text, True, (200, 50, 50) if i == 0 else (50, 50, 50))
-        #     screen.blit(text_surf, (SCREEN_WIDTH - 300, 10 + i * 25))
-
-        if player.is_alive:
-            screen.blit(player.image, camera.apply(player))
-            draw_health_bar(screen, camera, player, 0, -20)
-
-            # Draw attack overlay if active
-            if player.current_overlay:
-                overlay_sprite = player.get_overlay_sprite(player.current_overlay)
-                if overlay_sprite:
-                    overlay_pos = player.get_overlay_position()
-                    if overlay_pos:
-                        overlay_screen_pos = camera.apply_point(overlay_pos)
-                        overlay_rect = overlay_sprite.get_rect(center=overlay_screen_pos)
-                        screen.blit(overlay_sprite, overlay_rect)
-        else:
-            # Draw death message
-            death_font = pygame.font.SysFont(None, 72)
-            death_text = death_font.render("YOU DIED", True, (255, 0, 0))
-            respawn_text = font.render(
-                f"Respawning in {((player.respawn_time - (current_time - player.death_time)) // 1000 + 1)}...", True,
-                (255, 255, 255))
-            screen.blit(death_text, (SCREEN_WIDTH // 2 - death_text.get_width() // 2, SCREEN_HEIGHT // 2 - 50))
-            screen.blit(respawn_text, (SCREEN_WIDTH // 2 - respawn_text.get_width() // 2, SCREEN_HEIGHT // 2 + 20))
+                pygame.draw.rect(screen, YELLOW, camera.apply_rect(player.attack_hitbox, player), 2)
+
+        if self.show_debug:
+            self.draw_debug(screen)
+
+    def draw_debug(self, screen):
+        """Instructions and live stats; labels come from the text cache and
+        the numbers from its glyph strips, so nothing is rendered per frame"""
+        player = self.player
+        debug_info = [
+            ("Arrow Keys: Move", ""),
+            ("Space: Jump", ""),
+            ("Z: Attack", ""),
+            ("H: Trigger Hit Animation", ""),
+            ("B: Toggle Hitbox Visibility", ""),
+            ("M: Toggle Player Direction", ""),
+            ("F3: Toggle Debug Info", ""),
+            ("F4: Toggle Profiler, F5: Save CSV", ""),
+            ("Health: ", f"{player.health}/{player.max_health}"),
+            ("State: ", player.current_state),
+            ("Enemies: ", str(len(self.enemies))),
+            ("Projectiles: ", str(len(projectile_pool))),
+            ("Facing: ", "Right" if player.facing_right else "Left"),
+            ("Stunned: ", "Yes" if player.stunned else "No"),
+            ("Kills: ", f"{player.total_enemies_killed}/{self.total_enemies}"),
+            *self.tile_report,
+        ]
+        for i, (label, value) in enumerate(debug_info):
+            x = 10 + text_cache.draw(screen, label, (10, 10 + i * 25), 24, (50, 50, 50))
+            text_cache.draw(screen, value, (x, 10 + i * 25), 24, (50, 50, 50))
+
+        # Draw enemy info
+        enemy_info = [
+            "ENEMY TYPES:",
+            "RED: Charger - Charges when close",
+            "BLUE: Shooter - Shoots projectiles",
+            "PURPLE: Hybrid - Both melee and ranged"
+        ]
+        for i, text in enumerate(enemy_info):
+            text_cache.draw(screen, text, (SCREEN_WIDTH - 300, 10 + i * 25), 24,
+                            (200, 50, 50) if i == 0 else (50, 50, 50))
+
+    def summary(self, wall_time):
+        return {
+            "steps": self.step_count,
+            "sim_time": self.sim_time,
+            "wall_time": wall_time,
+            "level_complete": self.player.level_complete,
+            "health": self.player.health,
+            "enemies_killed": self.player.total_enemies_killed,
+            "enemies_left": len(self.enemies),
+            "total_enemies": self.total_enemies,
+        }
 
-        pygame.display.flip()
 
-    pygame.quit()
-    sys.exit()
+class DeathScene(Scene):
+    """Death message over the level, which keeps running until the respawn"""
+
+    overlay = True
+
+    def __init__(self, manager, player):
+        super().__init__(manager)
+        self.player = player
+
+    def update(self, frame_time):
+        if self.player.is_alive:
+            self.manager.pop()
+
+    def draw(self, screen):
+        death_text = text_cache.render("YOU DIED", 72, RED)
+        label = text_cache.render("Respawning in ", 24, WHITE)
+        count = f"{int(timers.remaining(self.player.respawn_timer) // 1000 + 1)}..."
+        x = SCREEN_WIDTH // 2 - (label.get_width() + text_cache.width(count, 24, WHITE)) // 2
+        screen.blit(death_text, (SCREEN_WIDTH // 2 - death_text.get_width() // 2, SCREEN_HEIGHT // 2 - 50))
+        screen.blit(label, (x, SCREEN_HEIGHT // 2 + 20))
+        text_cache.draw(screen, count, (x + label.get_width(), SCREEN_HEIGHT // 2 + 20), 24, WHITE)
+
+
+class WinScene(Scene):
+    """Win screen with performance rating; any key restarts the level"""
+
+    static = True
+
+    def __init__(self, manager, level):
+        super().__init__(manager)
+        self.level = level
+        player = level.player
+        total_enemies = level.total_enemies
+
+        # Calculate rating
+        rating, score = calculate_rating(player, total_enemies)
+
+        # Render text
+        self.lines = [
+            (text_cache.render("LEVEL COMPLETE!", 72, WHITE), 150),
+            (text_cache.render(f"Rating: {rating}", 48, WHITE), 250),
+            (text_cache.render(f"Score: {score:.1f}/100", 48, WHITE), 300),
+            (text_cache.render(
+                f"Health Lost: {player.initial_health - player.health} | Enemies Killed: {player.total_enemies_killed}/{total_enemies}",
+                36, WHITE), 350),
+            (text_cache.render("Press any key to continue...", 36, WHITE), 450),
+        ]
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            # Retry the same level instance from its first step
+            self.manager.pop()
+            self.level.reset()
+            self.level.play_music()
+
+    def draw(self, screen):
+        screen.fill(BLACK)
+        for text, y in self.lines:
+            screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, y))
+
+
+def bake_bundle(path=BUNDLE_PATH):
+    """Build the level once with recording on and write what got decoded"""
+    enable_headless()
+    assets.bundle.baking = {}
+    manager = SceneManager(bundle=None)
+    scene = GameplayScene(manager)
+    scene.exit()
+    return assets.bundle.bake(path)
+
+
+def main(headless=False, script=None, max_steps=None, max_time=None, profile=None):
+    """Run the level. With headless=True there is no window, audio or frame
+    pacing: steps run back to back, input comes from script and the run
+    stops after max_steps steps or max_time ms of simulated time, returning
+    a summary dict instead of exiting. With profile set the profiler starts
+    enabled and its last frames are written there as CSV at the end."""
+    profiler.enabled = bool(profile)
+    if not headless:
+        manager = SceneManager()
+        manager.push(GameplayScene(manager))
+        manager.run()
+        if profile:
+            profiler.export(profile)
+        pygame.quit()
+        sys.exit()
+
+    enable_headless()
+    manager = SceneManager(headless=True)
+    scene = GameplayScene(manager, script or ScriptedInput([]))
+    wall_start = pygame.time.get_ticks()
+    while not scene.player.level_complete:
+        if ((max_steps is not None and scene.step_count >= max_steps) or
+                (max_time is not None and scene.sim_time >= max_time)):
+            break
+        profiler.begin_frame()
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+        profiler.lap(PHASE_EVENTS)
+        scene.step()
+        profiler.end_frame()
+
+    result = scene.summary(pygame.time.get_ticks() - wall_start)
+    scene.exit()
+    if profile:
+        profiler.export(profile)
+    return result
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Neco Adventures")
+    parser.add_argument("--headless", action="store_true",
+                        help="simulate without a window, audio or frame pacing")
+    parser.add_argument("--script", help="input script of '<step> <action>' lines")
+    parser.add_argument("--steps", type=int, help="stop after this many simulation steps")
+    parser.add_argument("--time", type=float, help="stop after this many ms of simulated time")
+    parser.add_argument("--profile", metavar="CSV",
+                        help=f"time each frame by phase and write the last {PROFILE_FRAMES} frames to CSV on exit")
+    parser.add_argument("--bake", action="store_true",
+                        help=f"write decoded images and frames to {BUNDLE_PATH} for faster startup")
+    args = parser.parse_args()
+
+    if args.bake:
+        entries, size = bake_bundle()
+        print(f"Baked {entries} entries, {size / 2 ** 20:.1f} MiB of pixels, into {BUNDLE_PATH}")
+    elif args.headless:
+        script = ScriptedInput.from_file(args.script) if args.script else None
+        if args.steps is None and args.time is None:
+            parser.error("--headless needs --steps or --time")
+        for name, value in main(True, script, args.steps, args.time, args.profile).items():
+            print(f"{name}: {value}")
+    else:
+        main(profile=args.profile)
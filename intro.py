@@ -1,4 +1,4 @@
-from game import main
+from game import ASSET_LOADED, Scene, SceneManager, LoadingScene, GameplayScene
 import pygame
 from pygame.locals import *
 import sys
@@ -6,13 +6,8 @@ import math
 
 WIDTH = 640
 HEIGHT = 480
-FPS = 120
 
 pygame.init()
-pygame.mixer.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Neco Adventures")
-clock = pygame.time.Clock()
 
 
 def draw_rotated_ellipse(surface, color, rect, angle):
@@ -32,91 +27,125 @@ def terminate():
 INTRO_MUSIC = "music/The_Green_Kingdom_-_Untitled_OST_Hot_Line_Miami_2_70196730.mp3"  # Replace with your music file
 
 
-def start_screen():
-    try:
-        pygame.mixer.music.load(INTRO_MUSIC)
-        pygame.mixer.music.play(-1)  # -1 = loop indefinitely
-    except pygame.error as e:
-        print(f"Could not load music: {e}")
+def render_menu_item(font, line, color):
+    return pygame.transform.rotate(font.render(line, 1, pygame.Color(color)), -7)
 
-    intro_text = ["Продолжить", "Новая игра", "Выход"]
 
-    # Store rects for each menu item
-    menu_rects = []
-    selected_item = None
+class IntroScene(Scene):
+    """Title menu; repaints only the items whose highlight changed"""
 
-    bg = pygame.image.load("img/neco_title_wip1.png").convert()
-    screen.blit(bg, (0, 0))
+    static = True
 
-    font = pygame.font.Font(None, 28)
-    text_coord = 67
+    def enter(self):
+        self.manager.set_mode((WIDTH, HEIGHT))
+        try:
+            pygame.mixer.music.load(INTRO_MUSIC)
+            pygame.mixer.music.play(-1)  # -1 = loop indefinitely
+        except pygame.error as e:
+            print(f"Could not load music: {e}")
 
-    # Render menu items and store their rects
-    for i, line in enumerate(intro_text):
-        string_rendered = font.render(line, 1, pygame.Color('black'))
-        intro_rect = string_rendered.get_rect()
-        text_coord += 10
-        intro_rect.top = text_coord
-        intro_rect.x = 300
-        text_coord += intro_rect.height
+        intro_text = ["Продолжить", "Новая игра", "Выход"]
 
-        rotated_text = pygame.transform.rotate(string_rendered, -7)
-        rotated_rect = rotated_text.get_rect(center=intro_rect.center)
+        self.bg = pygame.image.load("img/neco_title_wip1.png").convert()
 
-        screen.blit(rotated_text, rotated_rect)
-        menu_rects.append((rotated_rect, i))  # Store rect and index
+        font = pygame.font.Font(None, 28)
+        text_coord = 67
 
-    while True:
-        # Redraw background to clear previous highlights
-        screen.blit(bg, (0, 0))
+        # Render every menu item once, plain and highlighted, with its rect
+        self.menu_items = []
+        for line in intro_text:
+            intro_rect = pygame.Rect((0, 0), font.size(line))
+            text_coord += 10
+            intro_rect.top = text_coord
+            intro_rect.x = 300
+            text_coord += intro_rect.height
 
-        # Get mouse position
-        mouse_pos = pygame.mouse.get_pos()
-        selected_item = None
+            normal = render_menu_item(font, line, 'black')
+            highlighted = render_menu_item(font, line, 'red')
+            rotated_rect = normal.get_rect(center=intro_rect.center)
+            self.menu_items.append((rotated_rect, normal, highlighted))
 
-        # Highlight and handle menu items
-        for rect, index in menu_rects:
-            # Check if mouse is over this item
-            if rect.collidepoint(mouse_pos):
-                selected_item = index
-                # Draw highlight
-                pygame.draw.rect(screen, (200, 200, 200, 128), rect, 2)
+        self.selected_item = self.hovered_item(pygame.mouse.get_pos())
+        self.dirty = None  # None repaints the whole screen
+        self.game = None
 
-            # Render the text again (with potential different color if selected)
-            color = pygame.Color('red') if index == selected_item else pygame.Color('black')
-            string_rendered = font.render(intro_text[index], 1, color)
-            rotated_text = pygame.transform.rotate(string_rendered, -7)
-            screen.blit(rotated_text, rect)
+    def hovered_item(self, pos):
+        hovered = None
+        for index, (rect, _, _) in enumerate(self.menu_items):
+            if rect.collidepoint(pos):
+                hovered = index
+        return hovered
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+    def redraw(self, screen, area):
+        # Rotated items can overlap, so repaint everything inside the area
+        screen.set_clip(area)
+        screen.blit(self.bg, (0, 0))
+        for index, (rect, normal, highlighted) in enumerate(self.menu_items):
+            if index == self.selected_item:
+                pygame.draw.rect(screen, (200, 200, 200, 128), rect, 2)
+                screen.blit(highlighted, rect)
+            else:
+                screen.blit(normal, rect)
+        screen.set_clip(None)
+
+    def start_game(self):
+        # Wait out whatever the preloader has not finished yet
+        self.manager.replace(LoadingScene(self.manager, lambda: self.game or GameplayScene(self.manager)))
+
+    def choose(self, index):
+        pygame.mixer.music.stop()
+        if index == 0:
+            # Продолжить
+            self.start_game()
+        elif index == 1:
+            # Новая игра
+            self.start_game()
+        elif index == 2:
+            # Выход
+            terminate()
+
+    def handle_event(self, event):
+        if event.type == ASSET_LOADED:
+            if self.manager.loader.finished() and self.game is None:
+                # Everything is decoded, so build the level while the menu idles
+                self.game = GameplayScene(self.manager)
+        elif event.type == pygame.WINDOWEXPOSED:
+            self.dirty = None
+        elif event.type == pygame.MOUSEMOTION:
+            hovered = self.hovered_item(event.pos)
+            if hovered != self.selected_item:
+                if self.dirty is not None:
+                    self.dirty += [self.menu_items[index][0] for index in (self.selected_item, hovered)
+                                   if index is not None]
+                self.selected_item = hovered
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            print(event.pos)
+            if event.button == 1:  # Left mouse button
+                for index, (rect, _, _) in enumerate(self.menu_items):
+                    if rect.collidepoint(event.pos):
+                        self.choose(index)
+                        return
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
                 terminate()
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                print(mouse_pos)
-                if event.button == 1:  # Left mouse button
-                    for rect, index in menu_rects:
-                        if rect.collidepoint(event.pos):
-                            return index  # Return the selected menu index
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    terminate()
-                elif event.key == pygame.K_RETURN:
-                    if selected_item is not None:
-                        return selected_item
-
-        pygame.display.flip()
-        clock.tick(FPS)
-
-
-# Call the function and handle the return value
-selected_option = start_screen()
-pygame.mixer.music.stop()
-if selected_option == 0:
-    # Продолжить
-    main()
-elif selected_option == 1:
-    # Новая игра
-    main()
-elif selected_option == 2:
-    # Выход
-    terminate()
+            elif event.key == pygame.K_RETURN:
+                if self.selected_item is not None:
+                    self.choose(self.selected_item)
+
+    def draw(self, screen):
+        if self.dirty is None:
+            self.redraw(screen, screen.get_rect())
+            self.dirty = []
+            return None
+        dirty, self.dirty = self.dirty, []
+        for rect in dirty:
+            self.redraw(screen, rect)
+        return dirty
+
+
+manager = SceneManager((WIDTH, HEIGHT))
+# Decode the game's assets while the menu is up
+manager.preload()
+manager.push(IntroScene(manager))
+manager.run()
+terminate()
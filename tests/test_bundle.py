@@ -0,0 +1,56 @@
+import json
+import struct
+
+import game
+
+
+def write_bundle(path, index, pixels=b"", version=game.BUNDLE_VERSION):
+    encoded = index if isinstance(index, bytes) else json.dumps(index).encode()
+    with open(path, "wb") as f:
+        f.write(struct.pack(game.BUNDLE_HEADER, game.BUNDLE_MAGIC, version, len(encoded)))
+        f.write(encoded)
+        f.write(pixels)
+
+
+def pixel_index(source):
+    item = {"size": [2, 2], "alpha": True, "bitsize": 32, "masks": [0, 0, 0, 0], "pitch": 8, "data": 0}
+    return {"sources": {source: game.file_digest(source)},
+            "entries": {"key": {"source": source, "frames": False, "surfaces": [item]}}}
+
+
+def test_open_reads_a_whole_bundle(tmp_path):
+    path = tmp_path / "assets.bundle"
+    write_bundle(path, pixel_index("img/tile.jpg"), bytes(16))
+    bundle = game.AssetBundle(game.Atlas())
+    assert bundle.open(path)
+    assert list(bundle.entries) == ["key"]
+
+
+def test_open_ignores_a_broken_index(tmp_path):
+    path = tmp_path / "assets.bundle"
+    write_bundle(path, b'{"sources": {"img/tile.jpg": ')
+    bundle = game.AssetBundle(game.Atlas())
+    assert not bundle.open(path)
+    assert bundle.data is None and bundle.entries == {}
+
+
+def test_open_ignores_an_index_missing_fields(tmp_path):
+    path = tmp_path / "assets.bundle"
+    write_bundle(path, {"sources": {}})
+    assert not game.AssetBundle(game.Atlas()).open(path)
+
+
+def test_open_ignores_truncated_pixels(tmp_path):
+    path = tmp_path / "assets.bundle"
+    write_bundle(path, pixel_index("img/tile.jpg"), bytes(10))
+    assert not game.AssetBundle(game.Atlas()).open(path)
+
+
+def test_open_ignores_other_versions_and_short_files(tmp_path):
+    path = tmp_path / "assets.bundle"
+    write_bundle(path, pixel_index("img/tile.jpg"), bytes(16), version=game.BUNDLE_VERSION + 1)
+    assert not game.AssetBundle(game.Atlas()).open(path)
+    path.write_bytes(game.BUNDLE_MAGIC)
+    assert not game.AssetBundle(game.Atlas()).open(path)
+    path.write_bytes(b"")
+    assert not game.AssetBundle(game.Atlas()).open(path)
@@ -0,0 +1,43 @@
+import pygame
+
+import game
+from test_headless import headless_scene
+
+
+def charging_at_player(scene):
+    # Let the player land, then stand a charger mid-charge on top of them
+    for _ in range(60):
+        scene.step()
+    player = scene.player
+    charger = next(enemy for enemy in scene.enemies if isinstance(enemy, game.ChargerEnemy))
+    charger.hitbox.midbottom = player.hitbox.midbottom
+    charger.rect.midbottom = charger.hitbox.midbottom
+    charger.state = "charge"
+    charger.charge_direction = pygame.math.Vector2(0, 0)
+    charger.last_charge_time = scene.sim_time
+    charger.last_attack_time = -charger.attack_cooldown
+    scene.activity.update(scene.camera)
+    return charger
+
+
+def test_charge_damage_comes_from_broadphase_contact():
+    scene = headless_scene()
+    charger = charging_at_player(scene)
+    health = scene.player.health
+    scene.step()
+    assert charger.striking
+    assert charger.last_attack_time == scene.sim_time
+    assert scene.player.health == health - charger.charge_damage
+    scene.exit()
+
+
+def test_no_strike_without_contact():
+    scene = headless_scene()
+    charger = charging_at_player(scene)
+    charger.rect.x += 5 * game.TILE_SIZE
+    charger.hitbox.x += 5 * game.TILE_SIZE
+    health = scene.player.health
+    scene.step()
+    assert charger.last_attack_time == -charger.attack_cooldown
+    assert scene.player.health == health
+    scene.exit()
@@ -0,0 +1,55 @@
+import game
+
+SCRIPT = [(0, "right"), (20, "jump"), (60, "attack"), (90, "stop"), (100, "left"), (150, "attack"),
+          (180, "right"), (200, "jump"), (240, "attack"), (300, "stop")]
+STEPS = 360
+
+
+def trace(scene, steps=STEPS):
+    states = []
+    for _ in range(steps):
+        scene.step()
+        player = scene.player
+        states.append((tuple(player.rect), player.health, player.total_enemies_killed, len(game.projectile_pool),
+                       tuple((tuple(enemy.rect), enemy.health) for enemy in scene.enemies)))
+    return states
+
+
+def headless_scene():
+    game.enable_headless()
+    manager = game.SceneManager(headless=True, bundle=None)
+    return game.GameplayScene(manager, game.ScriptedInput(SCRIPT))
+
+
+def test_scripted_runs_repeat_step_for_step():
+    first = headless_scene()
+    first_trace = trace(first)
+    first.exit()
+    second = headless_scene()
+    assert trace(second) == first_trace
+    second.exit()
+
+
+def test_main_headless_summary_is_deterministic():
+    runs = [game.main(headless=True, script=game.ScriptedInput(SCRIPT), max_steps=STEPS) for _ in range(2)]
+    for run in runs:
+        assert run.pop("wall_time") >= 0
+        assert run["steps"] == STEPS
+    assert runs[0] == runs[1]
+
+
+def test_script_drives_the_player():
+    scripted = trace(headless_scene())
+    game.enable_headless()
+    idle = game.GameplayScene(game.SceneManager(headless=True, bundle=None), game.ScriptedInput([]))
+    idle_trace = trace(idle)
+    assert scripted[-1][0][0] != idle_trace[-1][0][0]
+    assert len({state[0][0] for state in scripted}) > len({state[0][0] for state in idle_trace})
+
+
+def test_main_headless_stops_at_time_budget():
+    budget = 60 * game.SIM_STEP
+    result = game.main(headless=True, script=game.ScriptedInput(SCRIPT), max_time=budget)
+    assert result["sim_time"] >= budget
+    assert result["sim_time"] < budget + game.SIM_STEP
+    assert result["steps"] == 60
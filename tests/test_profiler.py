@@ -0,0 +1,83 @@
+import time
+
+import game
+
+
+def toggled_frame(profiler, delay=0.01):
+    # Same order as SceneManager.run: the frame begins before the F4 event
+    # that toggles the profiler is handled
+    profiler.begin_frame()
+    time.sleep(delay)
+    profiler.toggle()
+    profiler.lap(game.PHASE_EVENTS)
+    profiler.end_frame()
+
+
+def test_first_frame_after_enabling_is_timed_from_the_toggle():
+    profiler = game.Profiler(frames=8)
+    time.sleep(0.05)
+    toggled_frame(profiler)
+    assert profiler.count == 1
+    assert profiler.recorded()[0, -1] < 10
+
+
+def test_reenabling_drops_the_previous_frame():
+    profiler = game.Profiler(frames=8)
+    profiler.toggle()
+    profiler.begin_frame()
+    time.sleep(0.05)
+    profiler.lap(game.PHASE_ENEMIES)
+    profiler.end_frame()
+    profiler.toggle()
+    time.sleep(0.05)
+    toggled_frame(profiler)
+    assert profiler.count == 2
+    first, second = profiler.recorded()
+    assert first[game.PHASE_ENEMIES] >= 50
+    assert second[game.PHASE_ENEMIES] == 0
+    assert second[-1] < 10
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = game.Profiler(frames=8)
+    profiler.begin_frame()
+    profiler.lap(game.PHASE_EVENTS)
+    profiler.end_frame()
+    assert profiler.count == 0
+
+
+def slowed(method, delay=0.02):
+    def wrapper(*args, **kwargs):
+        time.sleep(delay)
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def test_step_charges_input_and_activity_to_their_own_phases(monkeypatch):
+    from test_headless import headless_scene
+
+    scene = headless_scene()
+    monkeypatch.setattr(scene.script, "poll", slowed(scene.script.poll))
+    monkeypatch.setattr(scene.activity, "update", slowed(scene.activity.update))
+    profiler = game.Profiler(frames=8)
+    monkeypatch.setattr(game, "profiler", profiler)
+    profiler.toggle()
+    profiler.begin_frame()
+    scene.step()
+    profiler.end_frame()
+    row = profiler.recorded()[0]
+    assert row[game.PHASE_EVENTS] >= 20
+    assert row[game.PHASE_ACTIVITY] >= 20
+    assert row[game.PHASE_ENEMIES] < 20
+    scene.exit()
+
+
+def test_headless_profile_exports_every_phase(tmp_path):
+    from test_headless import SCRIPT
+
+    path = tmp_path / "profile.csv"
+    game.main(headless=True, script=game.ScriptedInput(SCRIPT), max_steps=30, profile=str(path))
+    game.profiler.enabled = False
+    lines = path.read_text().splitlines()
+    assert lines[0].split(",") == game.PHASE_NAMES + ["frame"]
+    assert len(lines) > 1 and len(lines[1].split(",")) == len(game.PHASE_NAMES) + 1
@@ -0,0 +1,24 @@
+import pygame
+
+import game
+
+T = game.TILE_SIZE
+
+
+def test_query_returns_each_rect_once_clipped_to_touched_cells():
+    grid = game.TileGrid()
+    wall = pygame.Rect(0, 0, T, 10 * T)
+    block = pygame.Rect(T, 4 * T, T, T)
+    grid.add(wall)
+    grid.add(block)
+
+    # Spans three rows of the wall and the whole block
+    found = grid.query(pygame.Rect(T // 2, 3 * T + 1, T, 2 * T))
+    assert found == [pygame.Rect(0, 3 * T, T, 3 * T), block]
+    assert found[1] is block
+
+
+def test_query_misses_empty_cells():
+    grid = game.TileGrid()
+    grid.add(pygame.Rect(0, 0, T, T))
+    assert grid.query(pygame.Rect(5 * T, 5 * T, T, T)) == []